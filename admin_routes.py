@@ -0,0 +1,42 @@
+# -----admin_routes.py-----
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import PlainTextResponse
+from dependencies import get_profiler, get_settings, require_admin
+import logging
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/admin", dependencies=[Depends(require_admin)])
+
+# ====================================
+# LIVE PROFILING (X-Admin-Token required)
+# ====================================
+
+@router.get("/profile", response_class=PlainTextResponse)
+async def profile_process(
+    seconds: float = Query(10, gt=0),
+    mode: str = Query("sample", pattern="^(sample|cprofile)$"),
+    interval_ms: float = Query(None, gt=0),
+    profiler=Depends(get_profiler),
+    settings=Depends(get_settings),
+):
+    """Profile the live process; sample returns collapsed stacks for flame graphs, cprofile pstats text"""
+    if seconds > settings.profile_max_seconds:
+        raise HTTPException(status_code=400, detail=f"seconds must be at most {settings.profile_max_seconds}")
+    logger.info(f"PROFILE: Running {mode} profile for {seconds}s")
+    if mode == "cprofile":
+        profile = await profiler.cprofile(seconds)
+    else:
+        profile = await profiler.sample(seconds, interval_ms)
+    return PlainTextResponse(profile["output"], headers={"X-Profile-Id": profile["profile_id"]})
+
+@router.get("/profiles")
+async def list_profiles(profiler=Depends(get_profiler)):
+    """Recent profiles, including per-request ones taken with the X-Profile header"""
+    return profiler.list_profiles()
+
+@router.get("/profiles/{profile_id}", response_class=PlainTextResponse)
+async def get_profile(profile_id: str, profiler=Depends(get_profiler)):
+    """Output of a stored profile"""
+    return PlainTextResponse(profiler.get(profile_id)["output"])
@@ -0,0 +1,177 @@
+# -----app_factory.py-----
+
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import Optional
+
+from fastapi import FastAPI
+from fastapi.middleware.cors import CORSMiddleware
+
+import admin_routes
+import dataset_routes
+import env_request_routes
+import image_routes
+import jupyter_routes
+import training_job_routes
+from capacity_service import CapacityService
+from catalog_service import configure_catalog
+from container_runner import create_container_runner
+from dataset_upload_service import DatasetUploadService
+from env_request_archive import EnvRequestArchiver
+from env_request_search import EnvRequestSearchIndex
+from env_request_service import create_env_request_store
+from env_request_stats import EnvRequestStats
+from image_service import ImageService
+from jupyter_reaper import JupyterReaper
+from jupyter_service import JupyterService
+from profiling import ProfileMiddleware, Profiler
+from rate_limiter import RateLimiter, create_bucket_store
+from session_usage import SessionUsageRecorder
+from settings import Settings
+from token_store import InMemoryTokenStore, create_token_store, load_snapshot, save_snapshot
+from training_job_service import TrainingJobRunner
+
+logger = logging.getLogger(__name__)
+
+
+def create_app(settings: Optional[Settings] = None) -> FastAPI:
+    """Assemble the API from configuration: routers, token store, DB layer and Jupyter client"""
+    settings = settings or Settings.from_env()
+    configure_catalog(settings.catalog_path)
+
+    token_store = create_token_store(settings)
+    env_requests = create_env_request_store(settings)
+    env_request_stats = EnvRequestStats(settings, env_requests)
+    search_index = EnvRequestSearchIndex(settings, env_requests)
+    archiver = EnvRequestArchiver(settings, env_requests)
+    capacity = CapacityService(settings)
+    usage_recorder = SessionUsageRecorder(settings)
+    jupyter = JupyterService(settings, token_store, usage_recorder)
+    container_runner = create_container_runner(settings)
+    reaper = JupyterReaper(settings, jupyter, container_runner)
+    images = ImageService(settings, container_runner)
+    rate_limiter = RateLimiter(create_bucket_store(settings), enabled=settings.rate_limit_enabled)
+    training_jobs = TrainingJobRunner(settings, container_runner)
+    datasets = DatasetUploadService(settings)
+    profiler = Profiler(settings)
+    # Only the in-process token store needs carrying over a restart
+    snapshot_tokens = bool(settings.token_snapshot_path) and isinstance(token_store, InMemoryTokenStore)
+
+    # Startup timings in milliseconds, reported by /startup-timings
+    startup_timings = {}
+
+    async def timed_warm_up(name: str, warm_up) -> None:
+        """Run one warm-up step, recording its duration; failures are logged, not fatal"""
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(warm_up(), timeout=settings.warm_up_timeout_seconds)
+        except Exception as e:
+            logger.warning(f"STARTUP: {name} warm-up failed: {e!r}")
+        startup_timings[f"{name}_warm_up_ms"] = round((time.perf_counter() - started) * 1000, 1)
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        """Warm up DynamoDB and Jupyter connections before serving, clean up on shutdown"""
+        started = time.perf_counter()
+        if snapshot_tokens:
+            restored = load_snapshot(token_store, settings.token_snapshot_path)
+            logger.info(f"STARTUP: Restored {restored} presigned tokens from {settings.token_snapshot_path}")
+        # Importing PynamoDB/botocore and opening every DynamoDB connection happens
+        # while the Jupyter client connects, instead of in the first request
+        await asyncio.gather(
+            timed_warm_up("dynamodb", env_requests.warm_up),
+            timed_warm_up("capacity", capacity.warm_up),
+            timed_warm_up("usage", usage_recorder.warm_up),
+            timed_warm_up("jupyter", jupyter.check_jupyter_health),
+        )
+        startup_timings["lifespan_startup_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        logger.info(f"STARTUP: Ready, timings: {startup_timings}")
+
+        search_index.start()
+        archiver.start()
+        reaper.start()
+        usage_recorder.start()
+        datasets.start()
+        images.start()
+        yield
+        # Uvicorn has already stopped accepting connections and drained in-flight
+        # requests (timeout_graceful_shutdown) before lifespan shutdown runs
+        await datasets.stop()
+        await images.stop()
+        await archiver.stop()
+        await search_index.stop()
+        await training_jobs.stop()
+        await reaper.stop()
+        await usage_recorder.stop()
+        await jupyter.close()
+        if snapshot_tokens:
+            saved = save_snapshot(token_store, settings.token_snapshot_path)
+            logger.info(f"SHUTDOWN: Saved {saved} presigned tokens to {settings.token_snapshot_path}")
+
+    app = FastAPI(title="Environment Management API", version="1.0.0", lifespan=lifespan)
+    app.state.settings = settings
+    app.state.token_store = token_store
+    app.state.env_requests = env_requests
+    app.state.env_request_stats = env_request_stats
+    app.state.search_index = search_index
+    app.state.archiver = archiver
+    app.state.capacity = capacity
+    app.state.jupyter = jupyter
+    app.state.reaper = reaper
+    app.state.images = images
+    app.state.usage_recorder = usage_recorder
+    app.state.rate_limiter = rate_limiter
+    app.state.training_jobs = training_jobs
+    app.state.datasets = datasets
+    app.state.profiler = profiler
+    app.state.startup_timings = startup_timings
+
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=settings.cors_origins,
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+        expose_headers=["Retry-After", "ETag", "X-Profile-Id"],
+    )
+    # Opt-in per-request profiling (X-Profile header plus X-Admin-Token)
+    app.add_middleware(ProfileMiddleware, profiler=profiler)
+
+    app.include_router(env_request_routes.router)
+    app.include_router(jupyter_routes.router)
+    app.include_router(training_job_routes.router)
+    app.include_router(dataset_routes.router)
+    app.include_router(image_routes.router)
+    app.include_router(admin_routes.router)
+
+    # ===================================
+    # HEALTH CHECK ENDPOINTS
+    # ===================================
+
+    @app.get("/health")
+    async def health_check():
+        """API health check"""
+        return {"status": "healthy", "service": "Environment Management API"}
+
+    @app.get("/startup-timings")
+    async def get_startup_timings():
+        """Module import and startup warm-up durations of this process"""
+        return startup_timings
+
+    @app.get("/")
+    async def root():
+        """Root endpoint"""
+        return {
+            "message": "Environment Management API",
+            "version": "1.0.0",
+            "endpoints": {
+                "env_requests": "/env-request",
+                "jupyter": "/jupyter-status",
+                "docs": "/docs",
+                "debug": "/debug/test-env-request/{request_id}"
+            }
+        }
+
+    return app
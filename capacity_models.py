@@ -0,0 +1,41 @@
+from pynamodb.models import Model
+from pynamodb.attributes import UnicodeAttribute, NumberAttribute
+from pynamodb.indexes import GlobalSecondaryIndex, KeysOnlyProjection
+import os
+
+class InstanceCapacityModel(Model):
+    """Slots in use per instance type; the slot limit itself comes from settings"""
+    class Meta:
+        table_name = os.getenv("INSTANCE_CAPACITY_TABLE", "instance_capacity")
+        region = os.getenv("AWS_REGION", "us-east-1")
+        host = os.getenv("DYNAMODB_ENDPOINT_URL", None)
+
+    instance_type = UnicodeAttribute(hash_key=True)
+    in_use = NumberAttribute(default=0)
+
+class CapacityQueueIndex(GlobalSecondaryIndex):
+    """Sparse index over waiting reservations: only items with queued_at appear, oldest first"""
+    class Meta:
+        index_name = "capacity-queue-index"
+        projection = KeysOnlyProjection()
+        read_capacity_units = 1
+        write_capacity_units = 1
+
+    instance_type = UnicodeAttribute(hash_key=True)
+    queued_at = UnicodeAttribute(range_key=True)
+
+class CapacityReservationModel(Model):
+    """Admission state of one env request: reserved, queued or released"""
+    class Meta:
+        table_name = os.getenv("CAPACITY_RESERVATION_TABLE", "capacity_reservations")
+        region = os.getenv("AWS_REGION", "us-east-1")
+        host = os.getenv("DYNAMODB_ENDPOINT_URL", None)
+
+    request_id = UnicodeAttribute(hash_key=True)
+    instance_type = UnicodeAttribute()
+    state = UnicodeAttribute()
+    # Only set while waiting, so the entry drops out of the queue index once admitted
+    queued_at = UnicodeAttribute(null=True)
+    reserved_at = UnicodeAttribute(null=True)
+    released_at = UnicodeAttribute(null=True)
+    queue_index = CapacityQueueIndex()
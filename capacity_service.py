@@ -0,0 +1,331 @@
+# -----capacity_service.py-----
+
+import logging
+import random
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
+
+from env_request_service import transaction_connection
+from settings import Settings
+
+logger = logging.getLogger(__name__)
+
+# Attempts at a capacity transaction that lost a TransactionConflict to a concurrent one
+TRANSACTION_ATTEMPTS = 5
+
+
+def parse_capacity(spec: str) -> Dict[str, int]:
+    """Parse "small=8,medium=4,large=2" into slots per instance type"""
+    capacities = {}
+    for entry in spec.split(","):
+        if "=" in entry:
+            instance_type, slots = entry.split("=", 1)
+            capacities[instance_type.strip()] = int(slots)
+    return capacities
+
+
+def _models():
+    from capacity_models import CapacityReservationModel, InstanceCapacityModel
+    return CapacityReservationModel, InstanceCapacityModel
+
+
+def warm_up_connections() -> None:
+    """Create the capacity and reservation table connections ahead of the first admission"""
+    for model in _models():
+        model.describe_table()
+
+
+def _take_slot(transaction, instance_type: str, capacity: int) -> None:
+    """Conditional +1 on the in-use counter, failing the transaction when the type is full"""
+    _, InstanceCapacityModel = _models()
+    transaction.update(
+        InstanceCapacityModel(instance_type),
+        actions=[InstanceCapacityModel.in_use.add(1)],
+        condition=InstanceCapacityModel.in_use.does_not_exist() | (InstanceCapacityModel.in_use < capacity)
+    )
+
+
+def _cancellation_code(error, index: int) -> Optional[str]:
+    """Why action ``index`` of a cancelled transaction failed (None if it did not)"""
+    reasons = error.cancellation_reasons or []
+    reason = reasons[index] if index < len(reasons) else None
+    return reason.code if reason is not None else None
+
+
+def _is_conflict(error) -> bool:
+    return any(reason is not None and reason.code == "TransactionConflict" for reason in error.cancellation_reasons or [])
+
+
+def _backoff(attempt: int) -> None:
+    time.sleep(random.uniform(0, 0.05 * 2 ** attempt))
+
+
+def get_reservation(request_id: str):
+    CapacityReservationModel, _ = _models()
+    try:
+        return CapacityReservationModel.get(request_id)
+    except CapacityReservationModel.DoesNotExist:
+        return None
+
+
+def queue_length(instance_type: str) -> int:
+    CapacityReservationModel, _ = _models()
+    return CapacityReservationModel.queue_index.count(instance_type)
+
+
+def queue_position(reservation) -> int:
+    """1-based position of a waiting reservation in its instance type's queue"""
+    CapacityReservationModel, _ = _models()
+    return CapacityReservationModel.queue_index.count(
+        reservation.instance_type,
+        range_key_condition=CapacityReservationModel.queued_at < reservation.queued_at
+    ) + 1
+
+
+def describe_reservation(reservation) -> dict:
+    result = {
+        "request_id": reservation.request_id,
+        "instance_type": reservation.instance_type,
+        "state": reservation.state,
+        "reserved_at": reservation.reserved_at,
+        "released_at": reservation.released_at
+    }
+    if reservation.state == "queued":
+        result["queued_at"] = reservation.queued_at
+        result["position"] = queue_position(reservation)
+    return result
+
+
+def admit_request(request_id: str, instance_type: str, capacity: int) -> dict:
+    """Reserve a slot for a new request, or append it to the FIFO queue when the type is full"""
+    from pynamodb.exceptions import TransactWriteError
+    from pynamodb.transactions import TransactWrite
+
+    CapacityReservationModel, _ = _models()
+    existing = get_reservation(request_id)
+    if existing:
+        return describe_reservation(existing)
+
+    now = datetime.utcnow().isoformat()
+    # Requests already waiting go first, even if a slot happens to be free right now
+    if queue_length(instance_type) == 0:
+        for attempt in range(TRANSACTION_ATTEMPTS):
+            try:
+                with TransactWrite(connection=transaction_connection()) as transaction:
+                    _take_slot(transaction, instance_type, capacity)
+                    transaction.save(
+                        CapacityReservationModel(request_id, instance_type=instance_type, state="reserved", reserved_at=now),
+                        condition=CapacityReservationModel.request_id.does_not_exist()
+                    )
+                return describe_reservation(get_reservation(request_id))
+            except TransactWriteError as e:
+                if _cancellation_code(e, 1) == "ConditionalCheckFailed":
+                    # Admitted concurrently by another worker
+                    return describe_reservation(get_reservation(request_id))
+                if _cancellation_code(e, 0) == "ConditionalCheckFailed":
+                    logger.info(f"CAPACITY: No free {instance_type} slot for {request_id}, queueing")
+                    break
+                if not _is_conflict(e):
+                    raise
+                _backoff(attempt)
+        else:
+            # Queued behind nobody; the caller promotes it as soon as the contention settles
+            logger.warning(f"CAPACITY: {instance_type} slot still contended for {request_id} after {TRANSACTION_ATTEMPTS} attempts, queueing")
+
+    reservation = CapacityReservationModel(request_id, instance_type=instance_type, state="queued", queued_at=now)
+    reservation.save(condition=CapacityReservationModel.request_id.does_not_exist())
+    return describe_reservation(reservation)
+
+
+def release_request(request_id: str) -> Optional[str]:
+    """Give back a request's slot (or leave the queue); return its instance type if anything changed"""
+    from pynamodb.exceptions import TransactWriteError, UpdateError
+    from pynamodb.transactions import TransactWrite
+
+    CapacityReservationModel, InstanceCapacityModel = _models()
+    reservation = get_reservation(request_id)
+    if reservation is None or reservation.state == "released":
+        return None
+
+    now = datetime.utcnow().isoformat()
+    try:
+        if reservation.state == "reserved":
+            with TransactWrite(connection=transaction_connection()) as transaction:
+                transaction.update(
+                    InstanceCapacityModel(reservation.instance_type),
+                    actions=[InstanceCapacityModel.in_use.add(-1)],
+                    condition=InstanceCapacityModel.in_use > 0
+                )
+                transaction.update(
+                    CapacityReservationModel(request_id),
+                    actions=[CapacityReservationModel.state.set("released"), CapacityReservationModel.released_at.set(now)],
+                    condition=CapacityReservationModel.state == "reserved"
+                )
+        else:
+            reservation.update(
+                actions=[
+                    CapacityReservationModel.state.set("released"),
+                    CapacityReservationModel.queued_at.remove(),
+                    CapacityReservationModel.released_at.set(now)
+                ],
+                condition=CapacityReservationModel.state == "queued"
+            )
+    except (TransactWriteError, UpdateError):
+        # Released or promoted concurrently by another worker
+        logger.warning(f"CAPACITY: Reservation for {request_id} changed concurrently, not released")
+        return None
+    return reservation.instance_type
+
+
+def promote_waiting(instance_type: str, capacity: int) -> List[str]:
+    """Move queued requests into free slots, oldest first; return the admitted request ids"""
+    from pynamodb.exceptions import TransactWriteError
+    from pynamodb.transactions import TransactWrite
+
+    CapacityReservationModel, _ = _models()
+    promoted = []
+    retries = 0
+    while True:
+        head = next(iter(CapacityReservationModel.queue_index.query(instance_type, limit=1)), None)
+        if head is None:
+            break
+        try:
+            with TransactWrite(connection=transaction_connection()) as transaction:
+                _take_slot(transaction, instance_type, capacity)
+                transaction.update(
+                    CapacityReservationModel(head.request_id),
+                    actions=[
+                        CapacityReservationModel.state.set("reserved"),
+                        CapacityReservationModel.queued_at.remove(),
+                        CapacityReservationModel.reserved_at.set(datetime.utcnow().isoformat())
+                    ],
+                    condition=CapacityReservationModel.state == "queued"
+                )
+        except TransactWriteError as e:
+            if _cancellation_code(e, 0) == "ConditionalCheckFailed":
+                # No free slot
+                break
+            # The head left the queue concurrently (the GSI may still list it until it
+            # catches up) or another transaction won a conflict: back off and re-read
+            head_left = _cancellation_code(e, 1) == "ConditionalCheckFailed"
+            if not (head_left or _is_conflict(e)):
+                raise
+            if retries >= TRANSACTION_ATTEMPTS:
+                if head_left:
+                    logger.warning(f"CAPACITY: {instance_type} queue index still stale after {retries} retries")
+                    break
+                raise
+            _backoff(retries)
+            retries += 1
+            continue
+        promoted.append(head.request_id)
+    return promoted
+
+
+def get_capacity_overview(capacities: Dict[str, int]) -> Dict[str, dict]:
+    _, InstanceCapacityModel = _models()
+    in_use = {item.instance_type: int(item.in_use or 0) for item in InstanceCapacityModel.batch_get(list(capacities))}
+    return {
+        instance_type: {
+            "capacity": slots,
+            "in_use": in_use.get(instance_type, 0),
+            "available": max(0, slots - in_use.get(instance_type, 0)),
+            "queued": queue_length(instance_type)
+        }
+        for instance_type, slots in capacities.items()
+    }
+
+
+class CapacityService:
+    """Admission control per instance_type; disabled unless INSTANCE_CAPACITY is configured"""
+
+    def __init__(self, settings: Settings):
+        self.capacities = parse_capacity(settings.instance_capacity)
+        self.enabled = bool(self.capacities)
+
+    def validate_instance_type(self, instance_type: str) -> None:
+        """Reject instance types the registry has no slots for"""
+        if self.enabled and instance_type not in self.capacities:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Unknown instance_type '{instance_type}'. Valid: {sorted(self.capacities)}"
+            )
+
+    async def warm_up(self) -> None:
+        if self.enabled:
+            await run_in_threadpool(warm_up_connections)
+
+    async def _promote(self, instance_type: str) -> List[str]:
+        """Admit whoever fits from a type's queue; failures are logged and retried on the next call"""
+        try:
+            promoted = await run_in_threadpool(promote_waiting, instance_type, self.capacities[instance_type])
+        except Exception as e:
+            logger.error(f"CAPACITY: Promoting the {instance_type} queue failed: {e}")
+            return []
+        if promoted:
+            logger.info(f"CAPACITY: Admitted {promoted} from the {instance_type} queue")
+        return promoted
+
+    async def admit(self, request_id: str, instance_type: str) -> Optional[dict]:
+        if not self.enabled:
+            return None
+        admission = await run_in_threadpool(admit_request, request_id, instance_type, self.capacities[instance_type])
+        if admission["state"] == "queued":
+            # A queue left behind by a conflict or a failed promotion must not stall new requests
+            if request_id in await self._promote(instance_type):
+                admission = await self.get_admission(request_id)
+        logger.info(f"CAPACITY: {request_id} on {instance_type}: {admission['state']}")
+        return admission
+
+    async def release(self, request_id: str) -> List[str]:
+        """Release a request's slot and admit whoever is next in line"""
+        if not self.enabled:
+            return []
+        instance_type = await run_in_threadpool(release_request, request_id)
+        if instance_type is None or instance_type not in self.capacities:
+            return []
+        return await self._promote(instance_type)
+
+    async def get_admission(self, request_id: str) -> Optional[dict]:
+        if not self.enabled:
+            return None
+        reservation = await run_in_threadpool(get_reservation, request_id)
+        if reservation is None:
+            return None
+        return await run_in_threadpool(describe_reservation, reservation)
+
+    async def ensure_admitted(self, request_id: str, instance_type: str) -> None:
+        """Refuse provisioning for requests still waiting for capacity.
+
+        A request without a reservation (admission failed after it was saved, or it
+        predates INSTANCE_CAPACITY) is admitted now rather than let through.
+        """
+        if not self.enabled:
+            return
+        admission = await self.get_admission(request_id)
+        if admission is None:
+            self.validate_instance_type(instance_type)
+            admission = await self.admit(request_id, instance_type)
+        if admission["state"] == "queued" and admission["instance_type"] in self.capacities:
+            if request_id in await self._promote(admission["instance_type"]):
+                return
+            admission = await self.get_admission(request_id)
+        if admission["state"] == "queued":
+            raise HTTPException(
+                status_code=409,
+                detail=f"Waiting for {admission['instance_type']} capacity, queue position {admission['position']}"
+            )
+        if admission["state"] == "released":
+            raise HTTPException(status_code=409, detail="The capacity reservation for this request was released")
+
+    async def overview(self) -> dict:
+        if not self.enabled:
+            return {"enabled": False, "instance_types": {}}
+        return {
+            "enabled": True,
+            "instance_types": await run_in_threadpool(get_capacity_overview, self.capacities)
+        }
@@ -0,0 +1,126 @@
+# -----catalog_service.py-----
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from typing import Dict, FrozenSet, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CATALOG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "catalog.json")
+
+# How often the catalog file's mtime is checked for changes
+RELOAD_CHECK_SECONDS = 2.0
+
+
+def split_frameworks(framework_option: Optional[str]) -> List[str]:
+    """The UI joins the selected container images with commas"""
+    return [key.strip() for key in (framework_option or "").split(",") if key.strip()]
+
+
+class CatalogValidator:
+    """Allowed values and image/IDE/instance type rules compiled into set lookups"""
+
+    def __init__(self, catalog: dict):
+        self.instance_types: FrozenSet[str] = frozenset(catalog["instance_types"])
+        self.ides: FrozenSet[str] = frozenset(catalog["ides"])
+        self.ide_instance_types: Dict[str, FrozenSet[str]] = {
+            ide: frozenset(spec.get("instance_types", self.instance_types)) for ide, spec in catalog["ides"].items()
+        }
+        self.image_ides: Dict[str, FrozenSet[str]] = {
+            key: frozenset(spec.get("ides", self.ides)) for key, spec in catalog["images"].items()
+        }
+        self.image_instance_types: Dict[str, FrozenSet[str]] = {
+            key: frozenset(spec.get("instance_types", self.instance_types)) for key, spec in catalog["images"].items()
+        }
+        # An empty list accepts any data domain
+        self.data_domains: FrozenSet[str] = frozenset(domain.lower() for domain in catalog.get("data_domains", []))
+
+    def validate(self, instance_type: str, ide_option: str, framework_option: Optional[str], data_domain: str) -> List[str]:
+        """Return every problem with a combination; empty when it is allowed"""
+        errors = []
+        if instance_type not in self.instance_types:
+            errors.append(f"instance_type '{instance_type}' is not one of {sorted(self.instance_types)}")
+        if ide_option not in self.ides:
+            errors.append(f"ide_option '{ide_option}' is not one of {sorted(self.ides)}")
+        elif instance_type in self.instance_types and instance_type not in self.ide_instance_types[ide_option]:
+            errors.append(f"ide_option '{ide_option}' is not available on instance_type '{instance_type}'")
+        if self.data_domains and data_domain.lower() not in self.data_domains:
+            errors.append(f"data_domain '{data_domain}' is not one of {sorted(self.data_domains)}")
+
+        for image in split_frameworks(framework_option):
+            if image not in self.image_ides:
+                errors.append(f"framework_option '{image}' is not one of {sorted(self.image_ides)}")
+                continue
+            if ide_option in self.ides and ide_option not in self.image_ides[image]:
+                errors.append(f"image '{image}' does not support ide_option '{ide_option}'")
+            if instance_type in self.instance_types and instance_type not in self.image_instance_types[image]:
+                errors.append(f"image '{image}' does not run on instance_type '{instance_type}'")
+        return errors
+
+
+class Catalog:
+    """The parsed catalog file with its compiled validator and ETag"""
+
+    def __init__(self, raw: bytes, mtime: float, path: str = DEFAULT_CATALOG_PATH):
+        self.raw = raw
+        self.mtime = mtime
+        self.path = path
+        self.data = json.loads(raw)
+        self.validator = CatalogValidator(self.data)
+        self.etag = '"' + hashlib.sha256(raw).hexdigest()[:32] + '"'
+
+    def resolve_path(self, path: str) -> str:
+        """Resolve a path in the catalog relative to the catalog file's directory"""
+        return os.path.join(os.path.dirname(os.path.abspath(self.path)), path)
+
+
+class CatalogStore:
+    """Loads the catalog once and reloads it when the file changes on disk"""
+
+    def __init__(self, path: str = DEFAULT_CATALOG_PATH):
+        self.path = path
+        self._catalog: Optional[Catalog] = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def _load(self) -> Catalog:
+        with open(self.path, "rb") as f:
+            raw = f.read()
+        catalog = Catalog(raw, os.path.getmtime(self.path), self.path)
+        logger.info(f"CATALOG: Loaded {self.path} ({catalog.etag})")
+        return catalog
+
+    def get(self) -> Catalog:
+        now = time.monotonic()
+        if self._catalog is not None and now - self._checked_at < RELOAD_CHECK_SECONDS:
+            return self._catalog
+        with self._lock:
+            if self._catalog is None or now - self._checked_at >= RELOAD_CHECK_SECONDS:
+                self._checked_at = now
+                try:
+                    if self._catalog is None or os.path.getmtime(self.path) != self._catalog.mtime:
+                        self._catalog = self._load()
+                except (OSError, ValueError, KeyError) as e:
+                    # Keep serving the last good catalog while the file is being edited
+                    if self._catalog is None:
+                        raise
+                    logger.error(f"CATALOG: Reload of {self.path} failed, keeping the previous catalog: {e}")
+        return self._catalog
+
+
+_store = CatalogStore(os.getenv("CATALOG_PATH", DEFAULT_CATALOG_PATH))
+
+
+def configure_catalog(path: str) -> None:
+    """Point the process-wide catalog at another file (called by create_app)"""
+    global _store
+    if path != _store.path:
+        _store = CatalogStore(path)
+
+
+def get_catalog() -> Catalog:
+    return _store.get()
@@ -0,0 +1,110 @@
+# -----container_runner.py-----
+
+import asyncio
+import json
+import logging
+from typing import BinaryIO, Dict, List, NamedTuple, Optional, Set, Tuple
+
+from settings import Settings
+
+logger = logging.getLogger(__name__)
+
+# Enough of a failed build's output to see the error
+OUTPUT_TAIL_CHARS = 4000
+
+
+class CommandResult(NamedTuple):
+    returncode: int
+    output: str
+
+    @property
+    def ok(self) -> bool:
+        return self.returncode == 0
+
+
+class PodmanRunner:
+    """Runs container runtime commands as subprocesses, locally or on a named podman connection"""
+
+    def __init__(self, runtime: str = "podman"):
+        self.runtime = runtime
+
+    async def run(
+        self, args: List[str], host: str = "", timeout: Optional[float] = 60, log: Optional[BinaryIO] = None
+    ) -> CommandResult:
+        """Run a command; with ``log`` its output goes to that file instead of the result"""
+        command = [self.runtime] + (["--connection", host] if host else []) + list(args)
+        try:
+            process = await asyncio.create_subprocess_exec(
+                *command,
+                stdin=asyncio.subprocess.DEVNULL,
+                stdout=log or asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.STDOUT
+            )
+        except OSError as e:
+            return CommandResult(-1, str(e))
+        try:
+            output, _ = await asyncio.wait_for(process.communicate(), timeout=timeout)
+        except asyncio.TimeoutError:
+            process.kill()
+            await process.wait()
+            return CommandResult(-1, f"{' '.join(command)} timed out after {timeout}s")
+        except asyncio.CancelledError:
+            process.kill()
+            raise
+        return CommandResult(process.returncode, (output or b"").decode(errors="replace")[-OUTPUT_TAIL_CHARS:])
+
+
+class FakeRunner:
+    """In-memory stand-in for podman (CONTAINER_RUNNER=fake) for development and tests.
+
+    Tracks images (id and labels) per host and container states, records every
+    command, and fails any command that mentions one of the names in ``fail_on``.
+    """
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.commands: List[Tuple[str, List[str]]] = []
+        # host -> image -> {"id": ..., "labels": {...}}
+        self.images: Dict[str, Dict[str, dict]] = {}
+        self.containers: Dict[str, str] = {}
+        self.fail_on: Set[str] = set()
+        self._ids = 0
+
+    def _next_id(self) -> str:
+        self._ids += 1
+        return f"{self._ids:064x}"
+
+    async def run(
+        self, args: List[str], host: str = "", timeout: Optional[float] = 60, log: Optional[BinaryIO] = None
+    ) -> CommandResult:
+        args = list(args)
+        self.commands.append((host, args))
+        await asyncio.sleep(self.delay)
+        if self.fail_on.intersection(args):
+            return CommandResult(125, f"fake failure: {' '.join(args)}")
+
+        images = self.images.setdefault(host, {})
+        if args[:2] == ["image", "exists"]:
+            return CommandResult(0 if args[2] in images else 1, "")
+        if args[:2] == ["image", "inspect"]:
+            image = images.get(args[-1])
+            if image is None:
+                return CommandResult(125, f"no such image: {args[-1]}")
+            return CommandResult(0, f"{image['id']} {json.dumps(image['labels'] or None)}\n")
+        if args[0] == "pull":
+            images.setdefault(args[-1], {"id": self._next_id(), "labels": {}})
+        elif args[0] == "build":
+            labels = dict(args[i + 1].split("=", 1) for i, arg in enumerate(args) if arg == "--label")
+            images[args[args.index("-t") + 1]] = {"id": self._next_id(), "labels": labels}
+        elif args[0] in ("start", "restart"):
+            self.containers[args[1]] = "running"
+        elif args[0] == "stop":
+            self.containers[args[1]] = "exited"
+        return CommandResult(0, "")
+
+
+def create_container_runner(settings: Settings):
+    """Create the container runner for the configured backend"""
+    if settings.container_runner == "fake":
+        return FakeRunner()
+    return PodmanRunner(settings.container_runtime)
@@ -0,0 +1,51 @@
+# -----dataset_routes.py-----
+
+from fastapi import APIRouter, Depends, Header, Request
+from dataset_schemas import DatasetUploadCreate
+from dependencies import get_datasets
+import logging
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+# ====================================
+# DATASET UPLOAD ENDPOINTS
+# ====================================
+
+@router.get("/datasets")
+async def list_datasets(datasets=Depends(get_datasets)):
+    """List the files in the shared datasets volume (/app/data in the notebooks)"""
+    return datasets.list_datasets()
+
+@router.post("/datasets/uploads")
+async def create_dataset_upload(data: DatasetUploadCreate, datasets=Depends(get_datasets)):
+    """Start a resumable chunked upload; returns the chunk size to split the file by"""
+    logger.info(f"DATASETS: Starting upload of {data.filename}")
+    return datasets.create_upload(data)
+
+@router.put("/datasets/uploads/{upload_id}/chunks/{index}")
+async def upload_dataset_chunk(
+    upload_id: str,
+    index: int,
+    request: Request,
+    x_chunk_sha256: str = Header(..., description="Hex SHA-256 of the chunk body"),
+    datasets=Depends(get_datasets),
+):
+    """Upload one chunk as the raw request body; re-sending a chunk replaces it"""
+    return await datasets.write_chunk(upload_id, index, request.stream(), x_chunk_sha256)
+
+@router.get("/datasets/uploads/{upload_id}")
+async def get_dataset_upload(upload_id: str, datasets=Depends(get_datasets)):
+    """Upload progress, including the chunks still missing for a resume"""
+    return datasets.status(upload_id)
+
+@router.post("/datasets/uploads/{upload_id}/complete")
+async def complete_dataset_upload(upload_id: str, datasets=Depends(get_datasets)):
+    """Publish a fully received upload into the datasets volume"""
+    return await datasets.complete(upload_id)
+
+@router.delete("/datasets/uploads/{upload_id}")
+async def abort_dataset_upload(upload_id: str, datasets=Depends(get_datasets)):
+    """Abort an upload and delete what was received"""
+    return datasets.abort(upload_id)
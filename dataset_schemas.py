@@ -0,0 +1,12 @@
+# dataset_schemas.py
+
+from pydantic import BaseModel, Field
+from typing import Optional
+
+class DatasetUploadCreate(BaseModel):
+    filename: str = Field(..., example="iris.csv")
+    size: int = Field(..., ge=0, example=4551)
+    # Optional SHA-256 of the whole file, checked when the upload completes
+    sha256: Optional[str] = None
+    convert_to_parquet: bool = False
+    overwrite: bool = False
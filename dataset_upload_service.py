@@ -0,0 +1,345 @@
+# -----dataset_upload_service.py-----
+
+import asyncio
+import hashlib
+import importlib.util
+import json
+import logging
+import os
+import re
+import time
+import uuid
+from datetime import datetime
+from typing import AsyncIterator, Dict, List, Optional
+
+from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
+
+from dataset_schemas import DatasetUploadCreate
+from settings import Settings
+
+logger = logging.getLogger(__name__)
+
+# Received bytes are written to disk whenever this much has been buffered
+WRITE_BUFFER_BYTES = 1024 * 1024
+HASH_READ_BYTES = 8 * 1024 * 1024
+# How often the worker looks for abandoned uploads
+EXPIRY_SWEEP_SECONDS = 600
+
+SAFE_FILENAME = re.compile(r"^[A-Za-z0-9][A-Za-z0-9._-]*$")
+
+
+def convert_csv_to_parquet(csv_path: str, parquet_path: str) -> int:
+    """Stream a CSV into a Parquet file batch by batch; return the number of rows"""
+    try:
+        from pyarrow import csv as pa_csv
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("pyarrow is required for CSV to Parquet conversion")
+
+    rows = 0
+    tmp_path = parquet_path + ".tmp"
+    reader = pa_csv.open_csv(csv_path)
+    with pq.ParquetWriter(tmp_path, reader.schema, compression="zstd") as writer:
+        for batch in reader:
+            writer.write_batch(batch)
+            rows += batch.num_rows
+    os.replace(tmp_path, parquet_path)
+    return rows
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_READ_BYTES), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class DatasetUploadService:
+    """Resumable chunked uploads straight into the shared datasets volume.
+
+    Each chunk is streamed straight to its offset in ``.uploads/<upload_id>.part``
+    while its SHA-256 is computed, so the API never holds more than a small write
+    buffer per chunk. The manifest next to the part file records which chunks
+    arrived intact; a chunk is dropped from it before its bytes are rewritten and
+    added back only once they verify, so an interrupted upload resumes with only
+    the missing chunks. A background worker converts completed CSVs to Parquet
+    and deletes uploads abandoned for ``dataset_upload_expiry_hours``.
+    """
+
+    def __init__(self, settings: Settings):
+        self.settings = settings
+        self.datasets_dir = os.path.abspath(settings.datasets_dir)
+        self.uploads_dir = os.path.join(self.datasets_dir, ".uploads")
+        self.chunk_size = settings.dataset_chunk_size_mb * 1024 * 1024
+        self._uploads: Dict[str, dict] = {}
+        self._conversions: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def _manifest_path(self, upload_id: str) -> str:
+        return os.path.join(self.uploads_dir, f"{upload_id}.json")
+
+    def _part_path(self, upload_id: str) -> str:
+        return os.path.join(self.uploads_dir, f"{upload_id}.part")
+
+    def _save(self, upload: dict) -> None:
+        tmp_path = self._manifest_path(upload["upload_id"]) + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(upload, f)
+        os.replace(tmp_path, self._manifest_path(upload["upload_id"]))
+
+    def _get(self, upload_id: str) -> dict:
+        upload = self._uploads.get(upload_id)
+        if upload is None:
+            if not re.fullmatch(r"[0-9a-f-]{36}", upload_id) or not os.path.exists(self._manifest_path(upload_id)):
+                raise HTTPException(status_code=404, detail=f"Upload not found: {upload_id}")
+            with open(self._manifest_path(upload_id)) as f:
+                upload = self._uploads[upload_id] = json.load(f)
+        return upload
+
+    def create_upload(self, data: DatasetUploadCreate) -> dict:
+        """Register an upload and preallocate its part file"""
+        if not SAFE_FILENAME.match(data.filename):
+            raise HTTPException(status_code=400, detail=f"Invalid dataset filename: {data.filename}")
+        if data.size > self.settings.dataset_max_upload_gb * 1024 ** 3:
+            raise HTTPException(status_code=413, detail=f"Datasets are limited to {self.settings.dataset_max_upload_gb} GB")
+        if not data.overwrite and os.path.exists(os.path.join(self.datasets_dir, data.filename)):
+            raise HTTPException(status_code=409, detail=f"Dataset already exists: {data.filename}")
+        if data.convert_to_parquet:
+            if not data.filename.lower().endswith(".csv"):
+                raise HTTPException(status_code=400, detail="Only .csv datasets can be converted to Parquet")
+            if importlib.util.find_spec("pyarrow") is None:
+                raise HTTPException(status_code=400, detail="Parquet conversion needs pyarrow installed")
+
+        os.makedirs(self.uploads_dir, exist_ok=True)
+        upload_id = str(uuid.uuid4())
+        upload = {
+            "upload_id": upload_id,
+            "filename": data.filename,
+            "size": data.size,
+            "chunk_size": self.chunk_size,
+            "total_chunks": max(1, -(-data.size // self.chunk_size)),
+            "received": [],
+            "sha256": data.sha256.lower() if data.sha256 else None,
+            "convert_to_parquet": data.convert_to_parquet,
+            "overwrite": data.overwrite,
+            "state": "uploading",
+            "conversion": "pending" if data.convert_to_parquet else None,
+            "created_at": datetime.utcnow().isoformat(),
+            "completed_at": None
+        }
+        with open(self._part_path(upload_id), "wb") as f:
+            f.truncate(data.size)
+        self._uploads[upload_id] = upload
+        self._save(upload)
+        logger.info(f"DATASETS: Upload {upload_id} started for {data.filename} ({data.size} bytes, {upload['total_chunks']} chunks)")
+        return self.describe(upload)
+
+    def _forget_chunk(self, upload: dict, index: int) -> None:
+        if index in upload["received"]:
+            upload["received"].remove(index)
+            self._save(upload)
+
+    async def write_chunk(self, upload_id: str, index: int, body: AsyncIterator[bytes], sha256: str) -> dict:
+        """Stream one chunk to its offset in the part file, then mark it received once it verifies"""
+        upload = self._get(upload_id)
+        if upload["state"] != "uploading":
+            raise HTTPException(status_code=409, detail=f"Upload is already {upload['state']}")
+        if not 0 <= index < upload["total_chunks"]:
+            raise HTTPException(status_code=400, detail=f"Chunk index must be between 0 and {upload['total_chunks'] - 1}")
+        if not os.path.exists(self._part_path(upload_id)):
+            raise HTTPException(status_code=404, detail=f"Upload was aborted: {upload_id}")
+
+        # A resent chunk counts as missing until its new bytes verify
+        self._forget_chunk(upload, index)
+        offset = index * upload["chunk_size"]
+        expected = min(upload["chunk_size"], upload["size"] - offset)
+        digest = hashlib.sha256()
+        received = 0
+        buffer = bytearray()
+
+        f = await run_in_threadpool(open, self._part_path(upload_id), "r+b")
+        try:
+            await run_in_threadpool(f.seek, offset)
+            async for piece in body:
+                received += len(piece)
+                if received > expected:
+                    raise HTTPException(status_code=400, detail=f"Chunk {index} is larger than {expected} bytes")
+                digest.update(piece)
+                buffer += piece
+                if len(buffer) >= WRITE_BUFFER_BYTES:
+                    await run_in_threadpool(f.write, bytes(buffer))
+                    buffer.clear()
+            if buffer:
+                await run_in_threadpool(f.write, bytes(buffer))
+        finally:
+            await run_in_threadpool(f.close)
+
+        if received != expected:
+            raise HTTPException(status_code=400, detail=f"Chunk {index} has {received} bytes, expected {expected}")
+        if digest.hexdigest() != sha256.lower():
+            raise HTTPException(status_code=422, detail=f"Checksum mismatch for chunk {index}, upload it again")
+
+        if index not in upload["received"]:
+            upload["received"].append(index)
+            self._save(upload)
+        return {"upload_id": upload_id, "chunk": index, "received_chunks": len(upload["received"])}
+
+    async def complete(self, upload_id: str) -> dict:
+        """Move a fully received upload into the datasets volume"""
+        upload = self._get(upload_id)
+        if upload["state"] != "uploading":
+            return self.describe(upload)
+        missing = self._missing(upload)
+        if missing:
+            raise HTTPException(status_code=409, detail=f"{len(missing)} chunks missing, first: {missing[:20]}")
+
+        part_path = self._part_path(upload_id)
+        if upload["sha256"]:
+            actual = await run_in_threadpool(file_sha256, part_path)
+            if actual != upload["sha256"]:
+                raise HTTPException(status_code=422, detail="File checksum does not match, upload was corrupted")
+
+        target = os.path.join(self.datasets_dir, upload["filename"])
+        if not upload["overwrite"] and os.path.exists(target):
+            raise HTTPException(status_code=409, detail=f"Dataset already exists: {upload['filename']}")
+        os.replace(part_path, target)
+        upload["state"] = "complete"
+        upload["completed_at"] = datetime.utcnow().isoformat()
+        self._save(upload)
+        logger.info(f"DATASETS: Upload {upload_id} complete: {target}")
+
+        if upload["convert_to_parquet"] and self._conversions is not None:
+            self._conversions.put_nowait(upload_id)
+        return self.describe(upload)
+
+    def _delete(self, upload_id: str) -> None:
+        for path in (self._part_path(upload_id), self._manifest_path(upload_id)):
+            if os.path.exists(path):
+                os.remove(path)
+        self._uploads.pop(upload_id, None)
+
+    def abort(self, upload_id: str) -> dict:
+        upload = self._get(upload_id)
+        self._delete(upload_id)
+        logger.info(f"DATASETS: Upload {upload_id} aborted")
+        return {"upload_id": upload_id, "aborted": True, "filename": upload["filename"]}
+
+    def expire_abandoned(self) -> int:
+        """Delete unfinished uploads whose part file and manifest have not changed within the expiry window"""
+        if self.settings.dataset_upload_expiry_hours <= 0 or not os.path.isdir(self.uploads_dir):
+            return 0
+        cutoff = time.time() - self.settings.dataset_upload_expiry_hours * 3600
+        expired = 0
+        for name in os.listdir(self.uploads_dir):
+            upload_id, ext = os.path.splitext(name)
+            if ext not in (".json", ".part") or not re.fullmatch(r"[0-9a-f-]{36}", upload_id):
+                continue
+            paths = [p for p in (self._part_path(upload_id), self._manifest_path(upload_id)) if os.path.exists(p)]
+            if not paths or max(os.path.getmtime(p) for p in paths) >= cutoff:
+                continue
+            if os.path.exists(self._manifest_path(upload_id)):
+                upload = self._get(upload_id)
+                if upload["state"] != "uploading":
+                    continue
+            # A part file without a manifest is left over from an interrupted create or abort
+            self._delete(upload_id)
+            expired += 1
+            logger.info(f"DATASETS: Deleted upload {upload_id}, abandoned for over {self.settings.dataset_upload_expiry_hours}h")
+        return expired
+
+    @staticmethod
+    def _missing(upload: dict) -> List[int]:
+        received = set(upload["received"])
+        return [index for index in range(upload["total_chunks"]) if index not in received]
+
+    def status(self, upload_id: str) -> dict:
+        return self.describe(self._get(upload_id))
+
+    def describe(self, upload: dict) -> dict:
+        missing = self._missing(upload)
+        return {
+            "upload_id": upload["upload_id"],
+            "filename": upload["filename"],
+            "size": upload["size"],
+            "state": upload["state"],
+            "chunk_size": upload["chunk_size"],
+            "total_chunks": upload["total_chunks"],
+            "received_chunks": upload["total_chunks"] - len(missing),
+            "missing_chunks": missing,
+            "conversion": upload["conversion"],
+            "created_at": upload["created_at"],
+            "completed_at": upload["completed_at"]
+        }
+
+    def list_datasets(self) -> List[dict]:
+        """Files currently in the datasets volume"""
+        if not os.path.isdir(self.datasets_dir):
+            return []
+        datasets = []
+        for entry in sorted(os.scandir(self.datasets_dir), key=lambda e: e.name):
+            if entry.is_file() and not entry.name.startswith("."):
+                stat = entry.stat()
+                datasets.append({
+                    "name": entry.name,
+                    "size": stat.st_size,
+                    "modified_at": datetime.utcfromtimestamp(stat.st_mtime).isoformat()
+                })
+        return datasets
+
+    async def _convert(self, upload_id: str) -> None:
+        upload = self._get(upload_id)
+        csv_path = os.path.join(self.datasets_dir, upload["filename"])
+        parquet_path = os.path.splitext(csv_path)[0] + ".parquet"
+        upload["conversion"] = "running"
+        self._save(upload)
+        try:
+            rows = await run_in_threadpool(convert_csv_to_parquet, csv_path, parquet_path)
+            upload["conversion"] = "done"
+            logger.info(f"DATASETS: Converted {upload['filename']} to Parquet ({rows} rows)")
+        except Exception as e:
+            upload["conversion"] = f"failed: {e}"
+            logger.error(f"DATASETS: Parquet conversion of {upload['filename']} failed: {e}")
+        self._save(upload)
+
+    async def run_forever(self) -> None:
+        """Convert completed CSV uploads one at a time and periodically delete abandoned ones"""
+        next_sweep = 0.0
+        while True:
+            if time.monotonic() >= next_sweep:
+                try:
+                    await run_in_threadpool(self.expire_abandoned)
+                except Exception as e:
+                    logger.error(f"DATASETS: Expiry sweep failed: {e}")
+                next_sweep = time.monotonic() + EXPIRY_SWEEP_SECONDS
+            try:
+                upload_id = await asyncio.wait_for(self._conversions.get(), timeout=next_sweep - time.monotonic())
+            except asyncio.TimeoutError:
+                continue
+            try:
+                await self._convert(upload_id)
+            except Exception as e:
+                logger.error(f"DATASETS: Conversion worker error for {upload_id}: {e}")
+
+    def start(self) -> None:
+        """Start the upload worker and requeue conversions interrupted by a restart"""
+        if self._task is not None and not self._task.done():
+            return
+        self._conversions = asyncio.Queue()
+        if os.path.isdir(self.uploads_dir):
+            for name in os.listdir(self.uploads_dir):
+                if name.endswith(".json"):
+                    upload = self._get(name[:-len(".json")])
+                    if upload["state"] == "complete" and upload["conversion"] in ("pending", "running"):
+                        self._conversions.put_nowait(upload["upload_id"])
+        self._task = asyncio.create_task(self.run_forever())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
@@ -0,0 +1,76 @@
+# -----dependencies.py-----
+# FastAPI dependencies resolving the backends that create_app attached to app.state
+
+import hmac
+
+from fastapi import HTTPException, Request
+
+
+def is_admin(settings, request: Request) -> bool:
+    """True when the request carries the configured X-Admin-Token"""
+    token = request.headers.get("x-admin-token", "")
+    return bool(settings.admin_token) and hmac.compare_digest(token, settings.admin_token)
+
+
+def require_admin(request: Request) -> None:
+    settings = request.app.state.settings
+    if not settings.admin_token:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled (ADMIN_TOKEN is not set)")
+    if not is_admin(settings, request):
+        raise HTTPException(status_code=403, detail="Invalid or missing X-Admin-Token")
+
+
+def get_settings(request: Request):
+    return request.app.state.settings
+
+
+def get_archiver(request: Request):
+    return request.app.state.archiver
+
+
+def get_capacity(request: Request):
+    return request.app.state.capacity
+
+
+def get_datasets(request: Request):
+    return request.app.state.datasets
+
+
+def get_env_requests(request: Request):
+    return request.app.state.env_requests
+
+
+def get_env_request_stats(request: Request):
+    return request.app.state.env_request_stats
+
+
+def get_search_index(request: Request):
+    return request.app.state.search_index
+
+
+def get_images(request: Request):
+    return request.app.state.images
+
+
+def get_jupyter(request: Request):
+    return request.app.state.jupyter
+
+
+def get_reaper(request: Request):
+    return request.app.state.reaper
+
+
+def get_usage_recorder(request: Request):
+    return request.app.state.usage_recorder
+
+
+def get_profiler(request: Request):
+    return request.app.state.profiler
+
+
+def get_rate_limiter(request: Request):
+    return request.app.state.rate_limiter
+
+
+def get_training_jobs(request: Request):
+    return request.app.state.training_jobs
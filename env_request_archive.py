@@ -0,0 +1,233 @@
+# -----env_request_archive.py-----
+
+import asyncio
+import gzip
+import io
+import json
+import logging
+import os
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+
+from env_request_service import EnvRequestStore
+from settings import Settings
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_COLUMNS = (
+    "request_id", "env_name", "env_purpose", "use_case", "data_domain", "instance_type",
+    "ide_option", "framework_option", "requested_by", "status", "created_at", "expires_at"
+)
+ARCHIVE_PREFIX = "env_requests"
+
+
+def _row(item) -> dict:
+    row = {column: getattr(item, column, None) for column in ARCHIVE_COLUMNS}
+    if row["expires_at"] is not None:
+        row["expires_at"] = datetime.fromtimestamp(row["expires_at"], timezone.utc).isoformat()
+    return row
+
+
+def encode_archive(rows: List[dict]) -> Tuple[bytes, str]:
+    """Serialize rows column by column: zstd Parquet when pyarrow is installed, else gzipped column JSON"""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        columns = {column: [row[column] for row in rows] for column in ARCHIVE_COLUMNS}
+        return gzip.compress(json.dumps(columns).encode()), ".columns.json.gz"
+
+    table = pa.table({column: pa.array([row[column] for row in rows], pa.string()) for column in ARCHIVE_COLUMNS})
+    buffer = io.BytesIO()
+    pq.write_table(table, buffer, compression="zstd")
+    return buffer.getvalue(), ".parquet"
+
+
+def decode_archive(name: str, data: bytes) -> List[dict]:
+    if name.endswith(".parquet"):
+        import pyarrow.parquet as pq
+        return pq.read_table(io.BytesIO(data)).to_pylist()
+    columns = json.loads(gzip.decompress(data))
+    return [dict(zip(columns, values)) for values in zip(*columns.values())]
+
+
+class LocalArchiveStore:
+    """Archive objects in a local directory laid out like an object storage bucket"""
+
+    def __init__(self, root: str):
+        self.root = os.path.abspath(root)
+
+    def put(self, key: str, data: bytes) -> None:
+        path = os.path.join(self.root, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path + ".tmp", "wb") as f:
+            f.write(data)
+        os.replace(path + ".tmp", path)
+
+    def get(self, key: str) -> bytes:
+        with open(os.path.join(self.root, key), "rb") as f:
+            return f.read()
+
+    def list(self, prefix: str) -> List[str]:
+        base = os.path.join(self.root, prefix)
+        keys = []
+        for directory, _, files in os.walk(base):
+            for name in files:
+                if not name.endswith(".tmp"):
+                    keys.append(os.path.relpath(os.path.join(directory, name), self.root))
+        return sorted(keys)
+
+
+def create_archive_store(settings: Settings):
+    """Create the archive store; only the local directory stand-in exists for now"""
+    return LocalArchiveStore(settings.archive_dir)
+
+
+class EnvRequestArchiver:
+    """Moves expired terminal requests out of the hot table into compressed columnar archives.
+
+    Each pass writes the expired items to one archive object, plus a small
+    ``.meta.json`` (ids, statuses, instance types, created_at range) used to
+    skip objects at query time, and only then deletes the items from DynamoDB.
+    A crash in between leaves duplicates in the archive, which queries collapse.
+    """
+
+    def __init__(self, settings: Settings, env_requests: EnvRequestStore, store=None):
+        self.settings = settings
+        self.env_requests = env_requests
+        self.store = store or create_archive_store(settings)
+        self._metas: Dict[str, dict] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._pass_lock = asyncio.Lock()
+        self.stats = {"passes": 0, "archived": 0, "objects_written": 0, "last_pass": None, "last_error": None}
+
+    def _write(self, rows: List[dict]) -> str:
+        data, extension = encode_archive(rows)
+        now = datetime.utcnow()
+        key = f"{ARCHIVE_PREFIX}/dt={now:%Y-%m-%d}/{now:%H%M%S%f}-{len(rows)}{extension}"
+        created = [row["created_at"] for row in rows if row["created_at"]]
+        meta = {
+            "count": len(rows),
+            "request_ids": [row["request_id"] for row in rows],
+            "statuses": sorted({row["status"] or "" for row in rows}),
+            "instance_types": sorted({row["instance_type"] or "" for row in rows}),
+            "created_min": min(created) if created else None,
+            "created_max": max(created) if created else None,
+            "archived_at": now.isoformat()
+        }
+        self.store.put(key, data)
+        self.store.put(key + ".meta.json", json.dumps(meta).encode())
+        self._metas[key] = meta
+        return key
+
+    async def run_once(self) -> dict:
+        """Archive and delete every request whose expires_at has passed"""
+        async with self._pass_lock:
+            archived = 0
+            objects = []
+            # Each batch resumes the scan where the previous one stopped instead of rescanning the table
+            cursor = None
+            while True:
+                items, cursor = await self.env_requests.find_expired(
+                    self.settings.archive_batch_size, self.settings.search_scan_page_size, cursor
+                )
+                if not items:
+                    break
+                key = await run_in_threadpool(self._write, [_row(item) for item in items])
+                objects.append(key)
+                deleted = await self.env_requests.delete_archived(items)
+                archived += len(deleted)
+                logger.info(f"ARCHIVE: Wrote {len(items)} requests to {key}, deleted {len(deleted)} from the table")
+                if cursor is None or len(items) < self.settings.archive_batch_size:
+                    break
+
+            self.stats["passes"] += 1
+            self.stats["archived"] += archived
+            self.stats["objects_written"] += len(objects)
+            self.stats["last_pass"] = datetime.utcnow().isoformat()
+            return {"archived": archived, "objects": objects}
+
+    async def run_forever(self) -> None:
+        while True:
+            try:
+                await self.run_once()
+                self.stats["last_error"] = None
+            except Exception as e:
+                self.stats["last_error"] = str(e)
+                logger.error(f"ARCHIVE: Pass failed: {e}")
+            await asyncio.sleep(self.settings.archive_interval_minutes * 60)
+
+    def start(self) -> None:
+        if self.settings.archive_enabled and (self._task is None or self._task.done()):
+            self._task = asyncio.create_task(self.run_forever())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    # --- read path ---
+
+    def _load_metas(self) -> Dict[str, dict]:
+        for key in self.store.list(ARCHIVE_PREFIX):
+            if key.endswith(".meta.json"):
+                data_key = key[:-len(".meta.json")]
+                if data_key not in self._metas:
+                    self._metas[data_key] = json.loads(self.store.get(key))
+        return self._metas
+
+    def _query(self, request_id, status, instance_type, created_from, created_to, limit) -> dict:
+        rows: Dict[str, dict] = {}
+        scanned = 0
+        for key, meta in sorted(self._load_metas().items()):
+            if request_id and request_id not in meta["request_ids"]:
+                continue
+            if status and status not in meta["statuses"]:
+                continue
+            if instance_type and instance_type not in meta["instance_types"]:
+                continue
+            if created_from and meta["created_max"] and meta["created_max"] < created_from:
+                continue
+            if created_to and meta["created_min"] and meta["created_min"] > created_to:
+                continue
+            scanned += 1
+            for row in decode_archive(key, self.store.get(key)):
+                if request_id and row["request_id"] != request_id:
+                    continue
+                if status and row["status"] != status:
+                    continue
+                if instance_type and row["instance_type"] != instance_type:
+                    continue
+                if created_from and (row["created_at"] or "") < created_from:
+                    continue
+                if created_to and (row["created_at"] or "") > created_to:
+                    continue
+                # Later objects win if an item was archived twice
+                rows[row["request_id"]] = row
+        results = sorted(rows.values(), key=lambda row: row["created_at"] or "", reverse=True)
+        return {"total": len(results), "objects_scanned": scanned, "results": results[:limit]}
+
+    async def query(self, request_id: Optional[str] = None, status: Optional[str] = None,
+                    instance_type: Optional[str] = None, created_from: Optional[str] = None,
+                    created_to: Optional[str] = None, limit: int = 100) -> dict:
+        """Search the archives, reading only objects whose metadata can match"""
+        return await run_in_threadpool(self._query, request_id, status, instance_type, created_from, created_to, limit)
+
+    async def get(self, request_id: str) -> Optional[dict]:
+        result = await self.query(request_id=request_id, limit=1)
+        return result["results"][0] if result["results"] else None
+
+    def get_status(self) -> dict:
+        return {
+            "enabled": self.settings.archive_enabled,
+            "archive_after_days": self.settings.archive_after_days,
+            "interval_minutes": self.settings.archive_interval_minutes,
+            "archive_dir": self.settings.archive_dir,
+            **self.stats
+        }
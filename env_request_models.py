@@ -20,3 +20,18 @@ class EnvRequestModel(Model):
     requested_by = UnicodeAttribute()
     status = UnicodeAttribute(default="submitted")
     created_at = UnicodeAttribute(default=lambda: datetime.utcnow().isoformat())
+    # Epoch seconds, set when the request reaches a terminal status; the archiver moves it to
+    # cold storage after this. Deliberately not a TTLAttribute: native DynamoDB TTL on this
+    # attribute would delete items before the archiver has copied them, so leave it disabled.
+    expires_at = NumberAttribute(null=True)
+
+class EnvRequestStatsModel(Model):
+    """Running count of env requests per (dimension, value), e.g. ("status", "submitted")"""
+    class Meta:
+        table_name = os.getenv("ENV_REQUEST_STATS_TABLE", "env_request_stats")
+        region = os.getenv("AWS_REGION", "us-east-1")
+        host = os.getenv("DYNAMODB_ENDPOINT_URL", None)
+
+    dimension = UnicodeAttribute(hash_key=True)
+    value = UnicodeAttribute(range_key=True)
+    count = NumberAttribute(default=0)
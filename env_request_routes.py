@@ -0,0 +1,225 @@
+# -----env_request_routes.py-----
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from catalog_service import get_catalog
+from env_request_schemas import EnvRequestCreate, EnvRequestStatusUpdate
+from env_request_service import TERMINAL_STATUSES
+from dependencies import (
+    get_archiver, get_capacity, get_env_request_stats, get_env_requests, get_images, get_rate_limiter, get_search_index,
+    require_admin
+)
+from rate_limiter import client_keys, rate_limit
+from typing import Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+# ====================================
+# ENVIRONMENT REQUEST ENDPOINTS
+# ====================================
+
+@router.post("/env-request")
+async def create_env(
+    data: EnvRequestCreate,
+    request: Request,
+    env_requests=Depends(get_env_requests),
+    rate_limiter=Depends(get_rate_limiter),
+    capacity=Depends(get_capacity),
+    images=Depends(get_images),
+):
+    """Create a new environment request"""
+    rate_limiter.check("create-env-request", client_keys(request, data.requested_by))
+    capacity.validate_instance_type(data.instance_type)
+    logger.info(f"ENV REQUEST: Creating environment request for: {data.env_name}")
+    request_id = await env_requests.create(data)
+    logger.info(f"ENV REQUEST: Successfully created environment request with ID: {request_id}")
+    # Start fetching its framework images now rather than at provisioning time
+    images.request_images(data.framework_option)
+
+    response = {"request_id": request_id, "message": "Saved successfully"}
+    admission = await capacity.admit(request_id, data.instance_type)
+    if admission:
+        response["capacity"] = admission
+    return response
+
+@router.get("/env-request", dependencies=[Depends(rate_limit("list-env-requests"))])
+async def list_envs(env_requests=Depends(get_env_requests)):
+    """List all environment requests"""
+    logger.info("ENV REQUEST: Listing all environment requests")
+    result = await env_requests.list_all()
+    logger.info(f"ENV REQUEST: Found {len(result)} environment requests")
+    return result
+
+@router.get("/env-request/{request_id}")
+async def get_env(request_id: str, env_requests=Depends(get_env_requests), archiver=Depends(get_archiver)):
+    """Get specific environment request by ID, falling back to the archive"""
+    logger.info(f"ENV REQUEST: Getting environment request: {request_id}")
+    env = await env_requests.get(request_id)
+    if env:
+        logger.info(f"ENV REQUEST: Found environment request: {env.env_name}")
+        return env.attribute_values
+    archived = await archiver.get(request_id)
+    if archived:
+        logger.info(f"ENV REQUEST: Found archived environment request: {archived['env_name']}")
+        return dict(archived, archived=True)
+    logger.error(f"ENV REQUEST: Environment request not found: {request_id}")
+    raise HTTPException(status_code=404, detail="Not found")
+
+@router.patch("/env-request/{request_id}/status")
+async def update_env_status(
+    request_id: str,
+    data: EnvRequestStatusUpdate,
+    env_requests=Depends(get_env_requests),
+    capacity=Depends(get_capacity),
+):
+    """Change the status of an environment request; terminal statuses release its capacity"""
+    logger.info(f"ENV REQUEST: Setting status of {request_id} to {data.status}")
+    env = await env_requests.update_status(request_id, data.status)
+    if not env:
+        raise HTTPException(status_code=404, detail="Not found")
+    if data.status in TERMINAL_STATUSES:
+        await capacity.release(request_id)
+    return env.attribute_values
+
+@router.get("/env-request/{request_id}/capacity")
+async def get_env_capacity(request_id: str, capacity=Depends(get_capacity)):
+    """Admission state of a request, with its queue position while waiting"""
+    admission = await capacity.get_admission(request_id)
+    if not admission:
+        raise HTTPException(status_code=404, detail="No capacity reservation for this request")
+    return admission
+
+@router.get("/capacity")
+async def get_capacity_overview(capacity=Depends(get_capacity)):
+    """Slots, usage and queue length per instance type"""
+    return await capacity.overview()
+
+# ===================================
+# CATALOG
+# ===================================
+
+@router.get("/catalog")
+async def get_request_catalog(request: Request):
+    """Allowed instance types, IDEs, images and their compatibility; revalidate with If-None-Match"""
+    catalog = get_catalog()
+    headers = {"ETag": catalog.etag, "Cache-Control": "no-cache"}
+    if request.headers.get("if-none-match") == catalog.etag:
+        return Response(status_code=304, headers=headers)
+    return Response(content=catalog.raw, media_type="application/json", headers=headers)
+
+# ===================================
+# DASHBOARD STATS
+# ===================================
+
+@router.get("/env-request-stats")
+async def get_env_request_stats_summary(refresh: bool = False, stats=Depends(get_env_request_stats)):
+    """Request counts per status, data_domain and instance_type"""
+    return await stats.get_stats(refresh=refresh)
+
+@router.post("/env-request-stats/rebuild", dependencies=[Depends(require_admin)])
+async def rebuild_env_request_stats(stats=Depends(get_env_request_stats)):
+    """Recount the stats counters from a full table scan"""
+    logger.info("ENV REQUEST STATS: Rebuilding counters from a full scan...")
+    return await stats.rebuild()
+
+# ===================================
+# SEARCH
+# ===================================
+
+@router.get("/env-request-search")
+async def search_env_requests(
+    q: str = "",
+    status: Optional[str] = None,
+    instance_type: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=500),
+    search_index=Depends(get_search_index),
+):
+    """Search env_name, use_case, data_domain, env_purpose and requested_by by word prefix"""
+    return search_index.search(q, status=status, instance_type=instance_type, limit=limit)
+
+@router.get("/env-request-search/status")
+async def get_search_index_status(search_index=Depends(get_search_index)):
+    """Size and build state of the search index"""
+    return search_index.get_status()
+
+@router.post("/env-request-search/rebuild", dependencies=[Depends(require_admin)])
+async def rebuild_search_index(search_index=Depends(get_search_index)):
+    """Rebuild the search index from a full paginated scan"""
+    logger.info("SEARCH: Rebuilding index from a full scan...")
+    return await search_index.build()
+
+# ===================================
+# ARCHIVE
+# ===================================
+
+@router.get("/env-request-archive")
+async def query_env_request_archive(
+    request_id: Optional[str] = None,
+    status: Optional[str] = None,
+    instance_type: Optional[str] = None,
+    created_from: Optional[str] = None,
+    created_to: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    archiver=Depends(get_archiver),
+):
+    """Query archived requests; created_from/created_to are ISO timestamps"""
+    return await archiver.query(request_id, status, instance_type, created_from, created_to, limit)
+
+@router.get("/env-request-archive/status")
+async def get_env_request_archive_status(archiver=Depends(get_archiver)):
+    """Archive policy and archiver statistics"""
+    return archiver.get_status()
+
+@router.post("/env-request-archive/run", dependencies=[Depends(require_admin)])
+async def run_env_request_archiver(archiver=Depends(get_archiver)):
+    """Run one archival pass immediately"""
+    logger.info("ARCHIVE: Running archival pass...")
+    return await archiver.run_once()
+
+# ===================================
+# DEBUG ENDPOINT
+# ===================================
+
+@router.get("/debug/test-env-request/{request_id}")
+async def debug_test_env_request(request_id: str, env_requests=Depends(get_env_requests)):
+    """Debug endpoint to test environment request lookup"""
+    logger.info(f"DEBUG ENDPOINT: Testing lookup for request_id: {request_id}")
+    logger.info(f"DEBUG ENDPOINT: Request ID length: {len(request_id)}")
+
+    try:
+        env_request = await env_requests.get(request_id)
+
+        if env_request:
+            logger.info(f"DEBUG ENDPOINT: Found environment request: {env_request.env_name}")
+            return {
+                "found": True,
+                "request_id": env_request.request_id,
+                "env_name": env_request.env_name,
+                "ide_option": env_request.ide_option,
+                "created_at": env_request.created_at,
+                "status": getattr(env_request, 'status', 'unknown')
+            }
+
+        logger.error("DEBUG ENDPOINT: Environment request not found!")
+        # List all requests for debugging
+        all_requests = await env_requests.list_all()
+        logger.info(f"DEBUG ENDPOINT: Found {len(all_requests)} total requests")
+        existing_ids = [req.request_id for req in all_requests[:10]]  # First 10 IDs
+
+        return {
+            "found": False,
+            "searched_id": request_id,
+            "searched_id_length": len(request_id),
+            "total_requests": len(all_requests),
+            "existing_ids": existing_ids,
+            "first_existing_id_length": len(existing_ids[0]) if existing_ids else 0
+        }
+    except Exception as e:
+        logger.exception(f"DEBUG ENDPOINT: Exception occurred: {str(e)}")
+        return {
+            "found": False,
+            "error": str(e),
+            "searched_id": request_id
+        }
@@ -1,7 +1,8 @@
 # env_request_schemas.py
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, model_validator
 from typing import Optional
+from catalog_service import get_catalog, split_frameworks
 
 class EnvRequestCreate(BaseModel):
     env_name: str = Field(..., example="Data Science Sandbox")
@@ -14,6 +15,19 @@ class EnvRequestCreate(BaseModel):
     requested_by: Optional[str] = "anonymous"
     status: Optional[str] = "submitted"
 
+    @model_validator(mode="after")
+    def check_against_catalog(self):
+        """Reject values and image/IDE/instance type combinations the catalog does not allow"""
+        errors = get_catalog().validator.validate(self.instance_type, self.ide_option, self.framework_option, self.data_domain)
+        if errors:
+            raise ValueError("; ".join(errors))
+        if self.framework_option:
+            self.framework_option = ",".join(split_frameworks(self.framework_option))
+        return self
+
 class EnvRequestRead(EnvRequestCreate):
     request_id: str
     created_at: str
+
+class EnvRequestStatusUpdate(BaseModel):
+    status: str = Field(..., example="approved")
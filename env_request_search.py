@@ -0,0 +1,251 @@
+# -----env_request_search.py-----
+
+import asyncio
+import bisect
+import logging
+import re
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Set
+
+from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
+
+from env_request_service import EnvRequestStore, scan_env_requests
+from settings import Settings
+
+logger = logging.getLogger(__name__)
+
+# Free-text fields that are tokenized into the inverted index
+SEARCH_FIELDS = ("env_name", "use_case", "data_domain", "env_purpose", "requested_by")
+# Exact-match filters
+FILTER_FIELDS = ("status", "instance_type")
+# Fields returned with each hit
+RESULT_FIELDS = ("request_id", "env_name", "use_case", "data_domain", "status", "instance_type",
+                 "ide_option", "requested_by", "created_at")
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: Optional[str]) -> Set[str]:
+    return set(TOKEN_PATTERN.findall((text or "").lower()))
+
+
+# Retry delays of a failed background build (e.g. DynamoDB unreachable at boot)
+BUILD_RETRY_INITIAL_SECONDS = 5
+BUILD_RETRY_MAX_SECONDS = 300
+
+
+class _Index:
+    """Documents, postings and filter sets of one generation of the search index"""
+
+    def __init__(self):
+        self.docs: Dict[str, dict] = {}
+        self.postings: Dict[str, Set[str]] = {}
+        self.tokens: List[str] = []  # sorted, for prefix ranges
+        self.filters: Dict[str, Dict[str, Set[str]]] = {field: {} for field in FILTER_FIELDS}
+
+    def remove(self, request_id: str) -> None:
+        doc = self.docs.pop(request_id, None)
+        if doc is None:
+            return
+        for token in doc["_tokens"]:
+            ids = self.postings.get(token)
+            if ids is not None:
+                ids.discard(request_id)
+                if not ids:
+                    del self.postings[token]
+                    del self.tokens[bisect.bisect_left(self.tokens, token)]
+        for field in FILTER_FIELDS:
+            ids = self.filters[field].get(doc[field])
+            if ids is not None:
+                ids.discard(request_id)
+                if not ids:
+                    del self.filters[field][doc[field]]
+
+    def add(self, item) -> None:
+        doc = {field: getattr(item, field, None) for field in RESULT_FIELDS}
+        doc["_tokens"] = set().union(*(tokenize(getattr(item, field, None)) for field in SEARCH_FIELDS))
+        self.remove(doc["request_id"])
+        self.docs[doc["request_id"]] = doc
+        for token in doc["_tokens"]:
+            if token not in self.postings:
+                self.postings[token] = set()
+                bisect.insort(self.tokens, token)
+            self.postings[token].add(doc["request_id"])
+        for field in FILTER_FIELDS:
+            self.filters[field].setdefault(doc[field], set()).add(doc["request_id"])
+
+    def matching_prefix(self, prefix: str) -> Set[str]:
+        start = bisect.bisect_left(self.tokens, prefix)
+        end = bisect.bisect_left(self.tokens, prefix + "\uffff")
+        matches: Set[str] = set()
+        for token in self.tokens[start:end]:
+            matches |= self.postings[token]
+        return matches
+
+
+class EnvRequestSearchIndex:
+    """In-process inverted index over environment requests.
+
+    Built once from a paginated scan in the background at startup and kept
+    current through the store listener hooks, so a search is a few set
+    operations instead of a table scan. Query terms match token prefixes and
+    are combined with AND. A rebuild fills a new index and swaps it in when
+    complete, so searches meanwhile keep using the previous one.
+    """
+
+    def __init__(self, settings: Settings, env_requests: EnvRequestStore):
+        self.settings = settings
+        self.env_requests = env_requests
+        self._index = _Index()
+        # Listener updates made while a build scans, replayed onto the new index
+        self._pending: Optional[List[tuple]] = None
+        self._lock = threading.Lock()
+        self._building = False
+        self.ready = False
+        self.built_at: Optional[str] = None
+        self.build_ms: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self._task: Optional[asyncio.Task] = None
+        env_requests.add_listener(self)
+
+    # --- store listener hooks ---
+
+    def _apply(self, op: str, value) -> None:
+        with self._lock:
+            if op == "add":
+                self._index.add(value)
+            else:
+                self._index.remove(value)
+            if self._pending is not None:
+                self._pending.append((op, value))
+
+    def on_env_request_created(self, item) -> None:
+        self._apply("add", item)
+
+    def on_env_request_status_changed(self, item, old_status: str) -> None:
+        self._apply("add", item)
+
+    def on_env_request_archived(self, item) -> None:
+        self._apply("remove", item.request_id)
+
+    # --- build ---
+
+    def _build(self) -> int:
+        """Index every request page by page into a new index; writes made meanwhile are replayed on top"""
+        with self._lock:
+            self._pending = []
+        index = _Index()
+        count = 0
+        try:
+            for item in scan_env_requests(self.settings.search_scan_page_size):
+                index.add(item)
+                count += 1
+            with self._lock:
+                for op, value in self._pending:
+                    if op == "add":
+                        index.add(value)
+                    else:
+                        index.remove(value)
+                self._index = index
+        finally:
+            with self._lock:
+                self._pending = None
+        return count
+
+    async def build(self) -> dict:
+        if self._building:
+            raise HTTPException(status_code=409, detail="Search index build already running")
+        self._building = True
+        started = time.perf_counter()
+        try:
+            count = await run_in_threadpool(self._build)
+        except Exception as e:
+            self.last_error = str(e)
+            raise
+        finally:
+            self._building = False
+        self.ready = True
+        self.last_error = None
+        self.build_ms = round((time.perf_counter() - started) * 1000, 1)
+        self.built_at = datetime.utcnow().isoformat()
+        logger.info(f"SEARCH: Indexed {count} environment requests in {self.build_ms} ms")
+        return self.get_status()
+
+    async def _build_in_background(self) -> None:
+        """Build until it succeeds, backing off between failed attempts"""
+        delay = BUILD_RETRY_INITIAL_SECONDS
+        while not self.ready:
+            try:
+                await self.build()
+                return
+            except HTTPException:
+                # A rebuild started by an admin is already running
+                pass
+            except Exception as e:
+                logger.error(f"SEARCH: Index build failed, retrying in {delay}s: {e}")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, BUILD_RETRY_MAX_SECONDS)
+
+    def start(self) -> None:
+        """Build the index in the background so startup does not wait for the scan"""
+        if self.settings.search_index_enabled and (self._task is None or self._task.done()):
+            self._task = asyncio.create_task(self._build_in_background())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    # --- queries ---
+
+    def search(self, q: str = "", status: Optional[str] = None, instance_type: Optional[str] = None,
+               limit: int = 20) -> dict:
+        """Requests whose fields contain every query term as a token prefix, newest first"""
+        if not self.settings.search_index_enabled:
+            raise HTTPException(status_code=404, detail="Search index is disabled (SEARCH_INDEX_ENABLED=false)")
+        if not self.ready:
+            raise HTTPException(status_code=503, detail="Search index is still building", headers={"Retry-After": "5"})
+        started = time.perf_counter()
+        terms = tokenize(q)
+        with self._lock:
+            index = self._index
+            candidates: Optional[Set[str]] = None
+            # Narrowest sets first keeps the intersections small
+            for ids in sorted((index.matching_prefix(term) for term in terms), key=len):
+                candidates = ids if candidates is None else candidates & ids
+                if not candidates:
+                    break
+            for field, value in (("status", status), ("instance_type", instance_type)):
+                if value is not None:
+                    ids = index.filters[field].get(value, set())
+                    candidates = set(ids) if candidates is None else candidates & ids
+            if candidates is None:
+                candidates = set(index.docs)
+            docs = [index.docs[request_id] for request_id in candidates]
+        docs.sort(key=lambda doc: doc["created_at"] or "", reverse=True)
+        return {
+            "total": len(docs),
+            "results": [{field: doc[field] for field in RESULT_FIELDS} for doc in docs[:limit]],
+            "took_ms": round((time.perf_counter() - started) * 1000, 3)
+        }
+
+    def get_status(self) -> dict:
+        with self._lock:
+            documents, tokens = len(self._index.docs), len(self._index.tokens)
+        return {
+            "enabled": self.settings.search_index_enabled,
+            "ready": self.ready,
+            "building": self._building,
+            "documents": documents,
+            "tokens": tokens,
+            "built_at": self.built_at,
+            "build_ms": self.build_ms,
+            "last_error": self.last_error
+        }
@@ -1,23 +1,266 @@
-from env_request_models import EnvRequestModel
+from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
 from env_request_schemas import EnvRequestCreate
+from settings import Settings
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
 import uuid
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
 
-def create_env_request(data: EnvRequestCreate) -> str:
-    request_id = str(uuid.uuid4())
+# Fields counted in env_request_stats
+STATS_DIMENSIONS = ("status", "data_domain", "instance_type")
+
+# Statuses that end an environment's life: they hand back capacity and start the archive clock
+TERMINAL_STATUSES = {"rejected", "cancelled", "completed", "terminated", "deleted"}
+
+# Counter value for requests that leave a dimension empty (e.g. no data_domain)
+EMPTY_STATS_VALUE = "(none)"
+
+_connection = None
+
+def _model():
+    # PynamoDB pulls in botocore, so it is imported on first use (normally
+    # during the startup warm-up) instead of when the API module loads
+    from env_request_models import EnvRequestModel
+    return EnvRequestModel
+
+def _stats_model():
+    from env_request_models import EnvRequestStatsModel
+    return EnvRequestStatsModel
+
+def transaction_connection():
+    """Connection reused by every transaction, so the botocore client is built once"""
+    global _connection
+    if _connection is None:
+        from pynamodb.connection import Connection
+        meta = _model().Meta
+        _connection = Connection(region=meta.region, host=meta.host)
+    return _connection
+
+def warm_up_connection() -> None:
+    """Create the request, stats and transaction connections and resolve credentials ahead of the first request"""
+    EnvRequestModel = _model()
+    EnvRequestModel.describe_table()
+    _stats_model().describe_table()
+    transaction_connection().describe_table(EnvRequestModel.Meta.table_name)
+
+def _stats_value(value: Optional[str]) -> str:
+    """DynamoDB rejects empty strings in key attributes, so unset fields are counted under a sentinel"""
+    return value or EMPTY_STATS_VALUE
+
+def _add_to_counter(dimension: str, value: Optional[str], delta: int) -> None:
+    """Apply an atomic ADD to one stats counter.
+
+    A plain UpdateItem ADD never conflicts with concurrent ADDs on the same hot
+    counter, unlike a transaction; if the process dies between the item write and
+    this call the counters drift until POST /env-request-stats/rebuild.
+    """
+    EnvRequestStatsModel = _stats_model()
+    EnvRequestStatsModel(dimension, _stats_value(value)).update(actions=[EnvRequestStatsModel.count.add(delta)])
+
+def create_env_request_item(data: EnvRequestCreate):
+    """Save a new environment request, then bump its stats counters"""
+    EnvRequestModel = _model()
     item = EnvRequestModel(
-        request_id=request_id,
+        request_id=str(uuid.uuid4()),
         created_at=datetime.utcnow().isoformat(),
         **data.dict()
     )
-    item.save()
-    return request_id
+    item.save(condition=EnvRequestModel.request_id.does_not_exist())
+    for dimension in STATS_DIMENSIONS:
+        _add_to_counter(dimension, getattr(item, dimension), 1)
+    return item
+
+def create_env_request(data: EnvRequestCreate) -> str:
+    return create_env_request_item(data).request_id
+
+def update_env_request_status(request_id: str, status: str, archive_after_days: int = 0) -> Optional[Tuple[object, str]]:
+    """Change a request's status, then move its status counter.
+
+    Terminal statuses set ``expires_at`` ``archive_after_days`` ahead (0 disables
+    it); leaving a terminal status clears it again.
+    Returns (item, old_status), or None if the request does not exist.
+    """
+    from pynamodb.exceptions import UpdateError
+
+    EnvRequestModel = _model()
+    item = get_env_request_by_id(request_id)
+    if item is None:
+        return None
+    old_status = item.status
+    if old_status == status:
+        return item, old_status
+
+    actions = [EnvRequestModel.status.set(status)]
+    if status in TERMINAL_STATUSES and archive_after_days > 0:
+        expires_at = datetime.now(timezone.utc) + timedelta(days=archive_after_days)
+        actions.append(EnvRequestModel.expires_at.set(int(expires_at.timestamp())))
+    elif item.expires_at is not None:
+        actions.append(EnvRequestModel.expires_at.remove())
+
+    try:
+        item.update(actions=actions, condition=EnvRequestModel.status == old_status)
+    except UpdateError as e:
+        if e.cause_response_code == "ConditionalCheckFailedException":
+            raise HTTPException(status_code=409, detail="Status was changed concurrently, retry the update")
+        raise
+    _add_to_counter("status", old_status, -1)
+    _add_to_counter("status", status, 1)
+    return item, old_status
+
+def find_expired_env_requests(limit: int, page_size: int, last_evaluated_key: Optional[dict] = None) -> Tuple[list, Optional[dict]]:
+    """Requests whose expires_at has passed, up to limit, continuing the scan after last_evaluated_key.
+
+    Returns (items, key to resume from), the key being None once the table is exhausted.
+    """
+    EnvRequestModel = _model()
+    now = int(datetime.now(timezone.utc).timestamp())
+    expired = EnvRequestModel.scan(
+        EnvRequestModel.expires_at <= now,
+        limit=limit,
+        page_size=page_size,
+        last_evaluated_key=last_evaluated_key
+    )
+    items = list(expired)
+    return items, expired.last_evaluated_key
+
+def delete_archived_env_requests(items: list) -> list:
+    """Delete archived requests and their stats counts; return the items actually deleted"""
+    from pynamodb.exceptions import DeleteError
+
+    EnvRequestModel = _model()
+    deleted = []
+    deltas = Counter()
+    for item in items:
+        try:
+            # Only if nothing changed since the item was written to the archive
+            item.delete(condition=EnvRequestModel.status == item.status)
+        except DeleteError as e:
+            if e.cause_response_code == "ConditionalCheckFailedException":
+                continue
+            raise
+        deleted.append(item)
+        for dimension in STATS_DIMENSIONS:
+            deltas[(dimension, _stats_value(getattr(item, dimension)))] -= 1
+    for (dimension, value), delta in deltas.items():
+        _add_to_counter(dimension, value, delta)
+    return deleted
 
 def get_all_env_requests():
-    return list(EnvRequestModel.scan())
+    return list(_model().scan())
+
+def scan_env_requests(page_size: int):
+    """Iterate over every request, fetching the table one page at a time"""
+    return _model().scan(page_size=page_size)
 
 def get_env_request_by_id(request_id: str):
+    EnvRequestModel = _model()
     try:
         return EnvRequestModel.get(request_id)
     except EnvRequestModel.DoesNotExist:
         return None
+
+def load_env_request_stats() -> Dict[str, Dict[str, int]]:
+    """Read every counter; the stats table holds one item per distinct value, not per request"""
+    stats: Dict[str, Dict[str, int]] = {dimension: {} for dimension in STATS_DIMENSIONS}
+    for counter in _stats_model().scan():
+        if counter.count:
+            stats.setdefault(counter.dimension, {})[counter.value] = int(counter.count)
+    return stats
+
+def rebuild_env_request_stats() -> Dict[str, Dict[str, int]]:
+    """Recount every dimension from a full table scan and overwrite the counters"""
+    EnvRequestStatsModel = _stats_model()
+    counts = {dimension: Counter() for dimension in STATS_DIMENSIONS}
+    for item in _model().scan():
+        for dimension in STATS_DIMENSIONS:
+            counts[dimension][_stats_value(getattr(item, dimension))] += 1
+
+    with EnvRequestStatsModel.batch_write() as batch:
+        for counter in EnvRequestStatsModel.scan():
+            if counter.value not in counts.get(counter.dimension, {}):
+                batch.delete(counter)
+        for dimension, values in counts.items():
+            for value, count in values.items():
+                batch.save(EnvRequestStatsModel(dimension, value, count=count))
+    return {dimension: dict(values) for dimension, values in counts.items()}
+
+class EnvRequestStore:
+    """Environment request access called inline on the event loop (DB_MODE=sync).
+
+    Listeners get ``on_env_request_created(item)``,
+    ``on_env_request_status_changed(item, old_status)`` and
+    ``on_env_request_archived(item)`` after each write.
+    """
+
+    def __init__(self, archive_after_days: int = 0):
+        self.archive_after_days = archive_after_days
+        self.listeners: List[object] = []
+
+    def add_listener(self, listener) -> None:
+        self.listeners.append(listener)
+
+    def _notify_created(self, item) -> None:
+        for listener in self.listeners:
+            listener.on_env_request_created(item)
+
+    def _notify_status_changed(self, item, old_status: str) -> None:
+        for listener in self.listeners:
+            listener.on_env_request_status_changed(item, old_status)
+
+    def _notify_archived(self, item) -> None:
+        for listener in self.listeners:
+            listener.on_env_request_archived(item)
+
+    async def _call(self, func, *args):
+        return func(*args)
+
+    async def create(self, data: EnvRequestCreate) -> str:
+        item = await self._call(create_env_request_item, data)
+        self._notify_created(item)
+        return item.request_id
+
+    async def update_status(self, request_id: str, status: str):
+        result = await self._call(update_env_request_status, request_id, status, self.archive_after_days)
+        if result is None:
+            return None
+        item, old_status = result
+        if old_status != status:
+            self._notify_status_changed(item, old_status)
+        return item
+
+    async def get(self, request_id: str):
+        return await self._call(get_env_request_by_id, request_id)
+
+    async def list_all(self):
+        return await self._call(get_all_env_requests)
+
+    async def find_expired(self, limit: int, page_size: int, last_evaluated_key: Optional[dict] = None) -> Tuple[list, Optional[dict]]:
+        return await self._call(find_expired_env_requests, limit, page_size, last_evaluated_key)
+
+    async def delete_archived(self, items: list) -> list:
+        deleted = await self._call(delete_archived_env_requests, items)
+        for item in deleted:
+            self._notify_archived(item)
+        return deleted
+
+    async def load_stats(self) -> Dict[str, Dict[str, int]]:
+        return await self._call(load_env_request_stats)
+
+    async def rebuild_stats(self) -> Dict[str, Dict[str, int]]:
+        return await self._call(rebuild_env_request_stats)
+
+    async def warm_up(self) -> None:
+        await self._call(warm_up_connection)
+
+class ThreadPoolEnvRequestStore(EnvRequestStore):
+    """Environment request access run in the thread pool so DynamoDB latency never blocks the event loop (DB_MODE=async)"""
+
+    async def _call(self, func, *args):
+        return await run_in_threadpool(func, *args)
+
+def create_env_request_store(settings: Settings) -> EnvRequestStore:
+    """Create the environment request store for the configured DB mode"""
+    if settings.db_mode == "sync":
+        return EnvRequestStore(settings.archive_after_days)
+    return ThreadPoolEnvRequestStore(settings.archive_after_days)
@@ -0,0 +1,73 @@
+# -----env_request_stats.py-----
+
+import threading
+import time
+from typing import Dict, Optional
+
+from env_request_service import EMPTY_STATS_VALUE, STATS_DIMENSIONS, EnvRequestStore
+from settings import Settings
+
+
+class EnvRequestStats:
+    """Dashboard aggregates served from an in-process snapshot of the stats counters.
+
+    The snapshot is reloaded from the counter table after ``stats_cache_ttl_seconds``
+    and adjusted in place on every create/status change made by this process.
+    """
+
+    def __init__(self, settings: Settings, env_requests: EnvRequestStore):
+        self.settings = settings
+        self.env_requests = env_requests
+        self._snapshot: Optional[Dict[str, Dict[str, int]]] = None
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+        env_requests.add_listener(self)
+
+    def _apply(self, dimension: str, value: str, delta: int) -> None:
+        with self._lock:
+            if self._snapshot is None:
+                return
+            counts = self._snapshot.setdefault(dimension, {})
+            value = value or EMPTY_STATS_VALUE
+            counts[value] = counts.get(value, 0) + delta
+            if counts[value] <= 0:
+                del counts[value]
+
+    def on_env_request_created(self, item) -> None:
+        for dimension in STATS_DIMENSIONS:
+            self._apply(dimension, getattr(item, dimension), 1)
+
+    def on_env_request_status_changed(self, item, old_status: str) -> None:
+        self._apply("status", old_status, -1)
+        self._apply("status", item.status, 1)
+
+    def on_env_request_archived(self, item) -> None:
+        for dimension in STATS_DIMENSIONS:
+            self._apply(dimension, getattr(item, dimension), -1)
+
+    def _set_snapshot(self, stats: Dict[str, Dict[str, int]]) -> None:
+        with self._lock:
+            self._snapshot = stats
+            self._loaded_at = time.monotonic()
+
+    async def get_stats(self, refresh: bool = False) -> dict:
+        """Counts per status, data_domain and instance_type"""
+        stale = time.monotonic() - self._loaded_at > self.settings.stats_cache_ttl_seconds
+        if refresh or self._snapshot is None or stale:
+            self._set_snapshot(await self.env_requests.load_stats())
+
+        with self._lock:
+            snapshot = {dimension: dict(values) for dimension, values in self._snapshot.items()}
+            age_seconds = round(time.monotonic() - self._loaded_at, 1)
+        return {
+            "total": sum(snapshot.get("status", {}).values()),
+            "by_status": snapshot.get("status", {}),
+            "by_data_domain": snapshot.get("data_domain", {}),
+            "by_instance_type": snapshot.get("instance_type", {}),
+            "snapshot_age_seconds": age_seconds
+        }
+
+    async def rebuild(self) -> dict:
+        """Recount from the full table (backfill or repair), then serve the new counts"""
+        self._set_snapshot(await self.env_requests.rebuild_stats())
+        return await self.get_stats()
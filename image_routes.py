@@ -0,0 +1,27 @@
+# -----image_routes.py-----
+
+from typing import Optional
+from fastapi import APIRouter, Depends
+from catalog_service import split_frameworks
+from dependencies import get_images, require_admin
+import logging
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+# ====================================
+# FRAMEWORK IMAGE ENDPOINTS
+# ====================================
+
+@router.get("/images")
+async def get_image_readiness(images=Depends(get_images)):
+    """Readiness of each catalog framework image on each container host"""
+    return images.get_status()
+
+@router.post("/images/sync", dependencies=[Depends(require_admin)])
+async def sync_images(framework_option: Optional[str] = None, images=Depends(get_images)):
+    """Pull or build missing images now; framework_option (comma-separated) limits it to those images"""
+    keys = split_frameworks(framework_option) or None
+    logger.info(f"IMAGES: Syncing {keys or 'all images'}...")
+    return await images.sync(keys)
@@ -0,0 +1,261 @@
+# -----image_service.py-----
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+
+from catalog_service import get_catalog, split_frameworks
+from settings import Settings
+
+logger = logging.getLogger(__name__)
+
+EXISTS_TIMEOUT_SECONDS = 30
+# How often the background loop looks for catalog changes
+CATALOG_CHECK_SECONDS = 30
+# Label holding the hash of everything an image was built from
+BUILD_HASH_LABEL = "io.envmanager.build-hash"
+
+
+def build_input_hash(context: str, files: List[str], extra: List[str]) -> str:
+    """Hash of the build files (relative to the context) and build arguments an image is made from"""
+    digest = hashlib.sha256()
+    for name in files:
+        with open(os.path.join(context, name), "rb") as f:
+            digest.update(name.encode() + b"\0" + f.read() + b"\0")
+    for value in extra:
+        digest.update(value.encode() + b"\0")
+    return digest.hexdigest()
+
+
+def _source(spec: dict) -> str:
+    """Images under localhost/ only exist where they were built; anything else is pulled"""
+    return spec.get("source") or ("build" if spec["image"].startswith("localhost/") else "pull")
+
+
+class ImageService:
+    """Keeps every framework image in the catalog present on every container host.
+
+    Built images share one base image (the common data-science stack), so each
+    framework variant only adds its own layers on top of cached ones. Every build
+    is labelled with a hash of its Containerfile, listed inputs, build args and
+    base image id; an image whose label no longer matches is rebuilt. Each host
+    is synced in the background and whenever a new request names its images;
+    readiness is tracked per image and host.
+    """
+
+    def __init__(self, settings: Settings, runner):
+        self.settings = settings
+        self.runner = runner
+        # podman connection names; "" is the local host
+        self.hosts = [host.strip() for host in settings.image_hosts.split(",") if host.strip()] or [""]
+        # image -> host -> readiness entry
+        self.readiness: Dict[str, Dict[str, dict]] = {}
+        self._inflight: Dict[Tuple[str, str], asyncio.Task] = {}
+        self._build_locks: Dict[str, asyncio.Lock] = {}
+        self._pulls: Optional[asyncio.Semaphore] = None
+        self._task: Optional[asyncio.Task] = None
+        self._catalog_etag: Optional[str] = None
+
+    def catalog_images(self) -> Dict[str, dict]:
+        """Catalog images that map to a container image, by framework key"""
+        return {key: spec for key, spec in get_catalog().data["images"].items() if spec.get("image")}
+
+    def _set(self, image: str, host: str, state: str, **details) -> None:
+        entry = {"state": state, "updated_at": datetime.utcnow().isoformat(), **details}
+        self.readiness.setdefault(image, {})[host] = entry
+
+    @staticmethod
+    def _build_config() -> dict:
+        """The catalog's image_build section, with the build context resolved against the catalog file"""
+        catalog = get_catalog()
+        build = dict(catalog.data.get("image_build", {}))
+        if build.get("context"):
+            build["context"] = catalog.resolve_path(build["context"])
+        return build
+
+    def _cache_args(self) -> List[str]:
+        repo = self.settings.image_cache_repo
+        return ["--cache-from", repo, "--cache-to", repo] if repo else []
+
+    async def _inspect(self, image: str, host: str) -> Optional[Tuple[str, dict]]:
+        """(image id, labels) of an image on a host, or None if it is not there"""
+        result = await self.runner.run(
+            ["image", "inspect", "--format", "{{.Id}} {{json .Labels}}", image],
+            host=host, timeout=EXISTS_TIMEOUT_SECONDS
+        )
+        if not result.ok:
+            return None
+        image_id, _, labels = result.output.strip().partition(" ")
+        try:
+            return image_id, json.loads(labels) or {}
+        except ValueError:
+            return image_id, {}
+
+    async def _input_hash(self, image: str, host: str, build: dict, containerfile: str, extra: List[str]) -> Optional[str]:
+        try:
+            return await run_in_threadpool(
+                build_input_hash, build["context"], [containerfile, *build.get("inputs", [])], extra
+            )
+        except OSError as e:
+            self._set(image, host, "failed", error=f"cannot read build inputs: {e}")
+            logger.error(f"IMAGES: Cannot hash build inputs of {image}: {e}")
+            return None
+
+    async def _run_step(self, image: str, host: str, state: str, args: List[str]) -> bool:
+        self._set(image, host, state)
+        started = time.perf_counter()
+        result = await self.runner.run(args, host=host, timeout=self.settings.image_build_timeout_minutes * 60)
+        duration = round(time.perf_counter() - started, 1)
+        if not result.ok:
+            self._set(image, host, "failed", error=result.output.strip()[-500:], duration_s=duration)
+            logger.error(f"IMAGES: {state} {image} on {host or 'local'} failed: {result.output.strip()[-500:]}")
+            return False
+        self._set(image, host, "ready", duration_s=duration)
+        logger.info(f"IMAGES: {image} ready on {host or 'local'} after {state} ({duration}s)")
+        return True
+
+    async def _build_if_changed(self, image: str, host: str, args: List[str], digest: str) -> Optional[str]:
+        """Build (``args`` ends with the context) unless the image's build-hash label matches; return its id, or None"""
+        current = await self._inspect(image, host)
+        if current is None or current[1].get(BUILD_HASH_LABEL) != digest:
+            if current is not None:
+                logger.info(f"IMAGES: Build inputs of {image} changed on {host or 'local'}, rebuilding")
+            if not await self._run_step(image, host, "building", args[:-1] + ["--label", f"{BUILD_HASH_LABEL}={digest}", args[-1]]):
+                return None
+            current = await self._inspect(image, host)
+            if current is None:
+                self._set(image, host, "failed", error="image missing after build")
+                return None
+        self._set(image, host, "ready")
+        return current[0]
+
+    async def _ensure_base(self, host: str) -> Optional[str]:
+        """Build the shared base image on a host if missing or outdated; return its id ("" without a base)"""
+        build = self._build_config()
+        base = build.get("base_image")
+        if not base:
+            return ""
+        digest = await self._input_hash(base, host, build, build["base_containerfile"], [])
+        if digest is None:
+            return None
+        return await self._build_if_changed(base, host, [
+            "build", "--layers", "-t", base, "-f", os.path.join(build["context"], build["base_containerfile"]),
+            *self._cache_args(), build["context"]
+        ], digest)
+
+    async def _ensure(self, key: str, spec: dict, host: str, refresh: bool) -> bool:
+        try:
+            return await self._ensure_image(key, spec, host, refresh)
+        except Exception as e:
+            logger.exception(f"IMAGES: Ensuring {spec['image']} on {host or 'local'} failed: {e}")
+            self._set(spec["image"], host, "failed", error=str(e))
+            return False
+
+    async def _ensure_image(self, key: str, spec: dict, host: str, refresh: bool) -> bool:
+        image = spec["image"]
+        if _source(spec) == "pull":
+            # A pull of an up-to-date tag is cheap, so full syncs always pull to pick up new digests
+            if not refresh and await self._inspect(image, host) is not None:
+                self._set(image, host, "ready")
+                return True
+            async with self._pulls:
+                return await self._run_step(image, host, "pulling", ["pull", image])
+
+        build = self._build_config()
+        # One build at a time per host keeps builds from starving the notebooks
+        async with self._build_locks.setdefault(host, asyncio.Lock()):
+            base_id = await self._ensure_base(host)
+            if base_id is None:
+                self._set(image, host, "failed", error="base image build failed")
+                return False
+            containerfile = build.get("containerfile", "Containerfile")
+            build_args = [f"FRAMEWORK={key}"]
+            if build.get("base_image"):
+                build_args.append(f"BASE_IMAGE={build['base_image']}")
+            # The base id is part of the hash, so a rebuilt base also rebuilds every variant
+            digest = await self._input_hash(image, host, build, containerfile, build_args + [base_id])
+            if digest is None:
+                return False
+            args = ["build", "--layers", "-t", image, "-f", os.path.join(build["context"], containerfile)]
+            for build_arg in build_args:
+                args += ["--build-arg", build_arg]
+            return await self._build_if_changed(image, host, args + self._cache_args() + [build["context"]], digest) is not None
+
+    def ensure(self, keys: Optional[List[str]] = None) -> List[asyncio.Task]:
+        """Start making the given framework images (default: all, re-checking ready ones) current on every host"""
+        if self._pulls is None:
+            self._pulls = asyncio.Semaphore(self.settings.image_max_parallel_pulls)
+        images = self.catalog_images()
+        tasks = []
+        for key in keys if keys is not None else list(images):
+            spec = images.get(key)
+            if spec is None:
+                continue
+            for host in self.hosts:
+                inflight = self._inflight.get((spec["image"], host))
+                if inflight is not None and not inflight.done():
+                    tasks.append(inflight)
+                    continue
+                task = asyncio.create_task(self._ensure(key, spec, host, refresh=keys is None))
+                self._inflight[(spec["image"], host)] = task
+                tasks.append(task)
+        return tasks
+
+    async def sync(self, keys: Optional[List[str]] = None) -> dict:
+        """Ensure images and wait for the result"""
+        await asyncio.gather(*self.ensure(keys), return_exceptions=True)
+        return self.get_status()
+
+    def request_images(self, framework_option: Optional[str]) -> None:
+        """Prefetch the images of a new request so they are ready before it is provisioned"""
+        keys = split_frameworks(framework_option)
+        if keys and self.settings.image_sync_enabled:
+            self.ensure(keys)
+
+    async def run_forever(self) -> None:
+        """Full sync on the interval, and as soon as the catalog changes"""
+        next_full_sync = 0.0
+        while True:
+            etag = get_catalog().etag
+            if time.monotonic() >= next_full_sync or etag != self._catalog_etag:
+                self._catalog_etag = etag
+                next_full_sync = time.monotonic() + self.settings.image_sync_interval_minutes * 60
+                try:
+                    await self.sync()
+                except Exception as e:
+                    logger.error(f"IMAGES: Sync failed: {e}")
+            await asyncio.sleep(CATALOG_CHECK_SECONDS)
+
+    def start(self) -> None:
+        if self.settings.image_sync_enabled and (self._task is None or self._task.done()):
+            self._task = asyncio.create_task(self.run_forever())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def get_status(self) -> dict:
+        """Readiness of each catalog image across all hosts"""
+        images = {}
+        for key, spec in self.catalog_images().items():
+            per_host = {host or "local": self.readiness.get(spec["image"], {}).get(host, {"state": "unknown"})
+                        for host in self.hosts}
+            images[key] = {
+                "image": spec["image"],
+                "source": _source(spec),
+                "ready": all(entry["state"] == "ready" for entry in per_host.values()),
+                "hosts": per_host
+            }
+        return {"enabled": self.settings.image_sync_enabled, "hosts": [host or "local" for host in self.hosts], "images": images}
@@ -0,0 +1,14 @@
+# -----jupyter_server_config.py-----
+#
+# Copied into the Jupyter container image next to kernel_pool.py:
+#   COPY jupyter_image/kernel_pool.py jupyter_image/jupyter_server_config.py /etc/jupyter/
+#   ENV PYTHONPATH=/etc/jupyter
+
+import os
+
+c = get_config()  # noqa: F821 - provided by Jupyter when it loads this file
+
+# Serve notebook sessions from a pool of kernels with the framework imports done
+c.ServerApp.kernel_manager_class = "kernel_pool.PooledKernelManager"
+c.PooledKernelManager.pool_size = int(os.environ.get("KERNEL_POOL_SIZE", "2"))
+c.PooledKernelManager.frameworks = os.environ.get("KERNEL_POOL_FRAMEWORKS", "xgboost")
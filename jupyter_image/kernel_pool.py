@@ -0,0 +1,135 @@
+# -----kernel_pool.py-----
+#
+# Ships inside the Jupyter container image (see jupyter_server_config.py).
+# Keeps a few kernels started ahead of time with the data science stack from
+# starter1.ipynb already imported, and hands one out when a notebook session
+# starts, so the first cell does not pay for the cold imports.
+
+import asyncio
+import json
+import logging
+import os
+from typing import Dict, List
+
+from jupyter_server.services.kernels.kernelmanager import AsyncMappingKernelManager
+from traitlets import Float, Integer, List as TraitList, Unicode
+
+logger = logging.getLogger(__name__)
+
+# Imported in every pooled kernel, under the names the starter notebooks use
+COMMON_IMPORTS = [
+    "import pandas as pd",
+    "import numpy as np",
+    "import matplotlib.pyplot as plt",
+    "import seaborn as sns",
+    "from sklearn.model_selection import train_test_split",
+]
+
+# Extra imports per framework_option key (see ModelTraining.tsx)
+FRAMEWORK_IMPORTS = {
+    "xgboost": ["import xgboost as xgb"],
+    "tensorflow": ["import tensorflow as tf"],
+    "pytorch": ["import torch"],
+    "custom": [],
+}
+
+
+def warm_up_code(frameworks: str) -> str:
+    """Build the import cell for a comma-separated framework_option value"""
+    lines = list(COMMON_IMPORTS)
+    for framework in frameworks.split(","):
+        lines.extend(FRAMEWORK_IMPORTS.get(framework.strip(), []))
+    # A missing optional library must not make the whole pool unusable
+    return "\n".join(f"try:\n    {line}\nexcept ImportError:\n    pass" for line in lines)
+
+
+class PooledKernelManager(AsyncMappingKernelManager):
+    """Kernel manager that serves session starts from a pool of pre-imported kernels.
+
+    Pooled kernels are hidden from ``/api/kernels`` until handed out, so the
+    API's idle reaper neither culls them nor counts them as user activity.
+    """
+
+    pool_size = Integer(2, config=True, help="Warm kernels kept ready per kernel name")
+    pool_kernel_names = TraitList(Unicode(), ["python3"], config=True, help="Kernel names to keep a pool for")
+    frameworks = Unicode(
+        os.environ.get("KERNEL_POOL_FRAMEWORKS", "xgboost"),
+        config=True,
+        help="framework_option value deciding which frameworks are pre-imported",
+    )
+    warm_up_timeout = Float(120.0, config=True, help="Seconds allowed for the pre-import cell")
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._pool: Dict[str, List[str]] = {name: [] for name in self.pool_kernel_names}
+        self._filling: Dict[str, asyncio.Lock] = {}
+        if self.pool_size > 0:
+            from tornado.ioloop import IOLoop
+            IOLoop.current().add_callback(self.fill_all_pools)
+
+    async def _execute(self, kernel_id: str, code: str) -> bool:
+        client = self.get_kernel(kernel_id).client()
+        client.start_channels()
+        try:
+            await client.wait_for_ready(timeout=self.warm_up_timeout)
+            reply = await client.execute_interactive(
+                code, silent=True, store_history=False, timeout=self.warm_up_timeout
+            )
+            return reply["content"]["status"] == "ok"
+        finally:
+            client.stop_channels()
+
+    async def _start_pooled_kernel(self, kernel_name: str) -> None:
+        kernel_id = await super().start_kernel(kernel_name=kernel_name)
+        try:
+            if not await self._execute(kernel_id, warm_up_code(self.frameworks)):
+                raise RuntimeError("pre-import cell failed")
+        except Exception as e:
+            logger.warning(f"KERNEL POOL: Discarding {kernel_name} kernel {kernel_id}: {e}")
+            await self.shutdown_kernel(kernel_id, now=True)
+            return
+        self._pool[kernel_name].append(kernel_id)
+        logger.info(f"KERNEL POOL: {kernel_name} kernel {kernel_id} ready ({len(self._pool[kernel_name])}/{self.pool_size})")
+
+    async def fill_pool(self, kernel_name: str) -> None:
+        """Start kernels until the pool for kernel_name is full"""
+        lock = self._filling.setdefault(kernel_name, asyncio.Lock())
+        async with lock:
+            while len(self._pool[kernel_name]) < self.pool_size:
+                before = len(self._pool[kernel_name])
+                await self._start_pooled_kernel(kernel_name)
+                if len(self._pool[kernel_name]) == before:
+                    break
+
+    async def fill_all_pools(self) -> None:
+        await asyncio.gather(*(self.fill_pool(name) for name in self._pool))
+
+    async def _adopt(self, kernel_id: str, path, env) -> bool:
+        """Point a pooled kernel at the session's directory and environment"""
+        setup = ["import os"]
+        if path is not None:
+            setup.append(f"os.chdir({json.dumps(self.cwd_for_path(path))})")
+        if env:
+            setup.append(f"os.environ.update({json.dumps(dict(env))})")
+        try:
+            return await self._execute(kernel_id, "\n".join(setup))
+        except Exception as e:
+            logger.warning(f"KERNEL POOL: Could not adopt kernel {kernel_id}: {e}")
+            return False
+
+    async def start_kernel(self, *, kernel_id=None, path=None, **kwargs):
+        kernel_name = kwargs.get("kernel_name") or self.default_kernel_name
+        pool = self._pool.get(kernel_name)
+        while kernel_id is None and pool:
+            pooled_id = pool.pop(0)
+            asyncio.ensure_future(self.fill_pool(kernel_name))
+            if pooled_id in self and await self._adopt(pooled_id, path, kwargs.get("env")):
+                logger.info(f"KERNEL POOL: Handing out warm {kernel_name} kernel {pooled_id}")
+                return pooled_id
+            if pooled_id in self:
+                await self.shutdown_kernel(pooled_id, now=True)
+        return await super().start_kernel(kernel_id=kernel_id, path=path, **kwargs)
+
+    def list_kernels(self):
+        pooled = {kernel_id for ids in self._pool.values() for kernel_id in ids}
+        return [kernel for kernel in super().list_kernels() if kernel["id"] not in pooled]
@@ -0,0 +1,306 @@
+# -----jupyter_reaper.py-----
+
+import asyncio
+import logging
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from container_runner import create_container_runner
+from jupyter_service import JupyterService
+from settings import Settings
+
+logger = logging.getLogger(__name__)
+
+CONTAINER_COMMAND_TIMEOUT_SECONDS = 60
+READY_POLL_SECONDS = 0.5
+
+
+def _parse_jupyter_time(value: Optional[str]) -> Optional[datetime]:
+    """Parse a Jupyter ISO timestamp into a naive UTC datetime"""
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value.replace("Z", "+00:00")).replace(tzinfo=None)
+    except ValueError:
+        return None
+
+
+def _token_activity(info: dict) -> datetime:
+    """Most recent activity recorded on a presigned token"""
+    return info["last_accessed"] or info["created_at"]
+
+
+class JupyterReaper:
+    """Culls idle kernels and reclaims idle Jupyter containers"""
+
+    def __init__(self, settings: Settings, jupyter: JupyterService, runner=None):
+        self.settings = settings
+        self.jupyter = jupyter
+        self.runner = runner or create_container_runner(settings)
+        # Last observed activity per request_id
+        self.request_activity: Dict[str, datetime] = {}
+        # Last poll result per Jupyter backend URL
+        self.backend_state: Dict[str, dict] = {}
+        # Capacity reclaimed since process start
+        self.reclaimed_capacity = {
+            "kernels_culled": 0,
+            "containers_stopped": 0,
+            "containers_restarted": 0,
+            "events": deque(maxlen=100)
+        }
+        self._start_locks: Dict[str, asyncio.Lock] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def get_backends(self) -> Dict[str, str]:
+        """Map each Jupyter backend URL to the container that serves it"""
+        backends = {}
+        for entry in self.settings.jupyter_backends.split(","):
+            if "=" in entry:
+                url, container = entry.split("=", 1)
+                backends[url.strip().rstrip("/")] = container.strip()
+        if not backends:
+            backends[self.jupyter.base_url] = self.settings.jupyter_container_name
+        return backends
+
+    async def poll_backend(self, base_url: str) -> dict:
+        """Fetch kernels and sessions from a Jupyter backend"""
+        client = self.jupyter.http_client
+        kernels_response = await client.get(f"{base_url}/api/kernels")
+        kernels_response.raise_for_status()
+        sessions_response = await client.get(f"{base_url}/api/sessions")
+        sessions_response.raise_for_status()
+        return {
+            "kernels": kernels_response.json(),
+            "sessions": sessions_response.json()
+        }
+
+    async def cull_idle_kernels(self, base_url: str, kernels: List[dict], now: datetime) -> List[dict]:
+        """Shut down idle, disconnected kernels and return the ones left running"""
+        threshold = now - timedelta(minutes=self.settings.kernel_idle_timeout_minutes)
+        remaining = []
+        for kernel in kernels:
+            last_activity = _parse_jupyter_time(kernel.get("last_activity"))
+            idle = (
+                kernel.get("execution_state") != "busy"
+                and kernel.get("connections", 0) == 0
+                and last_activity is not None
+                and last_activity < threshold
+            )
+            if not idle:
+                remaining.append(kernel)
+                continue
+
+            try:
+                response = await self.jupyter.http_client.delete(f"{base_url}/api/kernels/{kernel['id']}")
+                response.raise_for_status()
+            except Exception as e:
+                logger.error(f"REAPER: Failed to cull kernel {kernel['id']} on {base_url}: {e}")
+                remaining.append(kernel)
+                continue
+
+            logger.info(f"REAPER: Culled idle kernel {kernel['id']} on {base_url} (idle since {last_activity})")
+            self.reclaimed_capacity["kernels_culled"] += 1
+            self.reclaimed_capacity["events"].append({
+                "type": "kernel_culled",
+                "backend_url": base_url,
+                "kernel_id": kernel["id"],
+                "idle_since": last_activity.isoformat(),
+                "at": now.isoformat()
+            })
+        return remaining
+
+    async def run_container_command(self, action: str, container: str) -> bool:
+        """Run a container runtime command (start/stop/restart) against a container"""
+        result = await self.runner.run([action, container], timeout=CONTAINER_COMMAND_TIMEOUT_SECONDS)
+        if not result.ok:
+            logger.error(f"REAPER: {self.settings.container_runtime} {action} {container} failed: {result.output.strip()}")
+        return result.ok
+
+    async def reclaim_container(self, base_url: str, container: str, idle_since: datetime, now: datetime) -> bool:
+        """Stop or recycle an idle backend container"""
+        action = "restart" if self.settings.idle_container_action == "restart" else "stop"
+        if not await self.run_container_command(action, container):
+            return False
+
+        logger.info(f"REAPER: {action} idle container {container} for {base_url} (idle since {idle_since})")
+        if action == "stop":
+            self.reclaimed_capacity["containers_stopped"] += 1
+            self.backend_state[base_url]["container_status"] = "stopped"
+        else:
+            self.reclaimed_capacity["containers_restarted"] += 1
+            # A fresh container starts a new idle period; otherwise it is restarted on every pass
+            self.backend_state[base_url]["last_activity"] = now
+        self.reclaimed_capacity["events"].append({
+            "type": f"container_{action}",
+            "backend_url": base_url,
+            "container": container,
+            "idle_since": idle_since.isoformat(),
+            "at": now.isoformat()
+        })
+        return True
+
+    async def wait_until_ready(self, base_url: str) -> bool:
+        """Poll a backend's Jupyter API until it answers or the start timeout passes"""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.settings.container_start_timeout_seconds
+        while True:
+            try:
+                response = await self.jupyter.http_client.get(f"{base_url}/api", timeout=5.0)
+                if response.status_code == 200:
+                    return True
+            except Exception:
+                pass
+            if loop.time() >= deadline:
+                logger.error(f"REAPER: {base_url} did not answer within {self.settings.container_start_timeout_seconds}s of starting")
+                return False
+            await asyncio.sleep(READY_POLL_SECONDS)
+
+    async def ensure_backend_running(self, base_url: Optional[str] = None) -> bool:
+        """Start a backend container again if the reaper stopped it, and wait until Jupyter answers"""
+        base_url = base_url or self.jupyter.base_url
+        state = self.backend_state.get(base_url)
+        if not state or state.get("container_status") != "stopped":
+            return True
+
+        # Concurrent requests for the same backend share one start
+        async with self._start_locks.setdefault(base_url, asyncio.Lock()):
+            if state.get("container_status") != "stopped":
+                return True
+            container = self.get_backends().get(base_url, self.settings.jupyter_container_name)
+            logger.info(f"REAPER: Starting reclaimed container {container} for {base_url}")
+            if not await self.run_container_command("start", container):
+                return False
+            if not await self.wait_until_ready(base_url):
+                return False
+            state["container_status"] = "running"
+            state["last_activity"] = datetime.utcnow()
+            return True
+
+    async def ensure_backend_for_token(self, presigned_token: str) -> bool:
+        """Start the backend behind a presigned token if it was reclaimed"""
+        token_info = self.jupyter.tokens.get(presigned_token)
+        if not token_info:
+            return True
+        return await self.ensure_backend_running(token_info.get("backend_url"))
+
+    async def run_once(self) -> dict:
+        """Run a single reaping pass over every backend"""
+        now = datetime.utcnow()
+        kernels_before = self.reclaimed_capacity["kernels_culled"]
+        containers_before = self.reclaimed_capacity["containers_stopped"] + self.reclaimed_capacity["containers_restarted"]
+
+        live_tokens = [info for _, info in self.jupyter.tokens.items() if now <= info["expires_at"]]
+
+        # Latest token activity per backend and per request_id
+        token_activity: Dict[str, datetime] = {}
+        for info in live_tokens:
+            activity = _token_activity(info)
+            backend_url = info.get("backend_url", self.jupyter.base_url)
+            token_activity[backend_url] = max(activity, token_activity.get(backend_url, activity))
+            self.request_activity[info["request_id"]] = max(activity, self.request_activity.get(info["request_id"], activity))
+
+        for base_url, container in self.get_backends().items():
+            state = self.backend_state.setdefault(base_url, {
+                "container": container,
+                "container_status": "running",
+                "last_activity": now
+            })
+            if state["container_status"] == "stopped":
+                continue
+
+            try:
+                polled = await self.poll_backend(base_url)
+            except Exception as e:
+                logger.error(f"REAPER: Failed to poll {base_url}: {e}")
+                state["error"] = str(e)
+                state["last_polled"] = now
+                continue
+
+            state.pop("error", None)
+            state["last_polled"] = now
+            kernels = await self.cull_idle_kernels(base_url, polled["kernels"], now)
+
+            # Kernel activity on a backend counts for every request served by it
+            activity_times = [t for t in (_parse_jupyter_time(k.get("last_activity")) for k in kernels) if t]
+            if base_url in token_activity:
+                activity_times.append(token_activity[base_url])
+            if activity_times:
+                state["last_activity"] = max(activity_times + [state["last_activity"]])
+            for info in live_tokens:
+                if info.get("backend_url", self.jupyter.base_url) == base_url:
+                    request_id = info["request_id"]
+                    self.request_activity[request_id] = max(state["last_activity"], self.request_activity.get(request_id, state["last_activity"]))
+
+            state["kernels"] = len(kernels)
+            state["sessions"] = len(polled["sessions"])
+
+            idle_threshold = now - timedelta(minutes=self.settings.container_idle_timeout_minutes)
+            if not kernels and state["last_activity"] < idle_threshold:
+                await self.reclaim_container(base_url, container, state["last_activity"], now)
+
+        # Forget requests that no longer hold a token
+        live_requests = {info["request_id"] for info in live_tokens}
+        for request_id in [r for r in self.request_activity if r not in live_requests]:
+            del self.request_activity[request_id]
+
+        return {
+            "kernels_culled": self.reclaimed_capacity["kernels_culled"] - kernels_before,
+            "containers_reclaimed": (
+                self.reclaimed_capacity["containers_stopped"] + self.reclaimed_capacity["containers_restarted"] - containers_before
+            ),
+            "backends_checked": len(self.backend_state)
+        }
+
+    async def run_forever(self) -> None:
+        """Run reaping passes until cancelled"""
+        logger.info(f"REAPER: Started, polling every {self.settings.reaper_interval_seconds}s")
+        while True:
+            try:
+                await self.run_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"REAPER: Reaping pass failed: {e}")
+            await asyncio.sleep(self.settings.reaper_interval_seconds)
+
+    def start(self) -> None:
+        """Start the background reaper task"""
+        if self.settings.reaper_enabled and (self._task is None or self._task.done()):
+            self._task = asyncio.create_task(self.run_forever())
+
+    async def stop(self) -> None:
+        """Cancel the background reaper task"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def get_status(self) -> dict:
+        """Get reaper configuration, backend state and reclaimed capacity"""
+        return {
+            "enabled": self.settings.reaper_enabled,
+            "running": self._task is not None and not self._task.done(),
+            "interval_seconds": self.settings.reaper_interval_seconds,
+            "kernel_idle_timeout_minutes": self.settings.kernel_idle_timeout_minutes,
+            "container_idle_timeout_minutes": self.settings.container_idle_timeout_minutes,
+            "idle_container_action": self.settings.idle_container_action,
+            "backends": {
+                url: {
+                    **state,
+                    "last_activity": state["last_activity"].isoformat(),
+                    "last_polled": state["last_polled"].isoformat() if state.get("last_polled") else None
+                }
+                for url, state in self.backend_state.items()
+            },
+            "request_activity": {request_id: ts.isoformat() for request_id, ts in self.request_activity.items()},
+            "reclaimed_capacity": {
+                "kernels_culled": self.reclaimed_capacity["kernels_culled"],
+                "containers_stopped": self.reclaimed_capacity["containers_stopped"],
+                "containers_restarted": self.reclaimed_capacity["containers_restarted"],
+                "recent_events": list(self.reclaimed_capacity["events"])
+            }
+        }
@@ -0,0 +1,147 @@
+# -----jupyter_routes.py-----
+
+from fastapi import APIRouter, Depends, HTTPException
+from dependencies import get_capacity, get_env_requests, get_jupyter, get_reaper, get_usage_recorder, require_admin
+from rate_limiter import rate_limit
+import logging
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+# ====================================
+# JUPYTER-RELATED ENDPOINTS
+# ====================================
+
+@router.post("/generate-jupyter-url/{request_id}", dependencies=[Depends(rate_limit("generate-jupyter-url"))])
+async def generate_jupyter_url(
+    request_id: str,
+    expiry_minutes: int = 60,
+    env_requests=Depends(get_env_requests),
+    jupyter=Depends(get_jupyter),
+    reaper=Depends(get_reaper),
+    capacity=Depends(get_capacity),
+):
+    """Generate a secure presigned URL for Jupyter access"""
+    logger.info(f"JUPYTER: Generating Jupyter URL for request_id: {request_id} (expiry {expiry_minutes} minutes)")
+
+    try:
+        # Bring the container back if the reaper reclaimed it
+        if not await reaper.ensure_backend_running():
+            raise HTTPException(status_code=503, detail="Jupyter container could not be started")
+
+        # Check Jupyter health first
+        jupyter_status = await jupyter.check_jupyter_health()
+        if not jupyter_status["jupyter_running"]:
+            logger.error(f"JUPYTER: Jupyter service not available: {jupyter_status.get('error', 'Unknown error')}")
+            raise HTTPException(
+                status_code=503,
+                detail=f"Jupyter service is not available: {jupyter_status.get('error', 'Unknown error')}"
+            )
+
+        # Single lookup, reused by the presigned URL generation
+        env_request = await env_requests.get(request_id)
+        if not env_request:
+            logger.error(f"JUPYTER: Environment request not found: {request_id}")
+            raise HTTPException(
+                status_code=404,
+                detail=f"Environment request not found: {request_id}"
+            )
+
+        # Check if IDE option is jupyter
+        if env_request.ide_option != "jupyter":
+            logger.error(f"JUPYTER: IDE is not Jupyter: {env_request.ide_option}")
+            raise HTTPException(
+                status_code=400,
+                detail=f"This environment request is not for Jupyter. IDE: {env_request.ide_option}"
+            )
+
+        # Requests still waiting for a slot are not provisioned yet
+        await capacity.ensure_admitted(request_id, env_request.instance_type)
+
+        url_data = jupyter.generate_presigned_url(env_request, expiry_minutes=expiry_minutes)
+        logger.info(f"JUPYTER: Generated presigned URL for request: {request_id}")
+
+        return {
+            "success": True,
+            "data": url_data,
+            "message": f"Presigned URL generated successfully. Valid for {expiry_minutes} minutes."
+        }
+
+    except HTTPException as he:
+        logger.error(f"JUPYTER: HTTP Exception {he.status_code}: {he.detail}")
+        raise
+    except Exception as e:
+        logger.exception(f"JUPYTER: Unexpected error generating presigned URL: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to generate presigned URL: {str(e)}")
+
+@router.get("/jupyter-access/{presigned_token}")
+async def jupyter_access(presigned_token: str, jupyter=Depends(get_jupyter), reaper=Depends(get_reaper)):
+    """Validate presigned token and redirect to Jupyter"""
+    logger.info(f"JUPYTER ACCESS: Accessing Jupyter with token: {presigned_token[:8]}...")
+    try:
+        await reaper.ensure_backend_for_token(presigned_token)
+        result = jupyter.validate_and_access_jupyter(presigned_token)
+        logger.info("JUPYTER ACCESS: Successfully validated token, redirecting to Jupyter")
+        return result
+    except HTTPException as he:
+        logger.error(f"JUPYTER ACCESS: HTTP Exception: {he.detail}")
+        raise
+    except Exception as e:
+        logger.error(f"JUPYTER ACCESS: Unexpected error: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to access Jupyter: {str(e)}")
+
+@router.get("/jupyter-status")
+async def jupyter_status(jupyter=Depends(get_jupyter)):
+    """Check Jupyter service health"""
+    result = await jupyter.check_jupyter_health()
+    logger.info(f"JUPYTER STATUS: Health check result: {result}")
+    return result
+
+@router.get("/active-jupyter-sessions")
+async def get_active_jupyter_sessions(jupyter=Depends(get_jupyter)):
+    """Get information about active Jupyter sessions"""
+    result = jupyter.get_active_sessions()
+    logger.info(f"JUPYTER SESSIONS: Found {result.get('active_sessions', 0)} active sessions")
+    return result
+
+@router.delete("/revoke-jupyter-token/{presigned_token}")
+async def revoke_jupyter_token(presigned_token: str, jupyter=Depends(get_jupyter)):
+    """Manually revoke a specific presigned token"""
+    logger.info(f"JUPYTER REVOKE: Revoking token: {presigned_token[:8]}...")
+    return jupyter.revoke_presigned_token(presigned_token)
+
+@router.post("/cleanup-expired-tokens")
+async def cleanup_expired_tokens(jupyter=Depends(get_jupyter)):
+    """Clean up all expired presigned tokens"""
+    result = jupyter.cleanup_expired_tokens()
+    logger.info(f"JUPYTER CLEANUP: Cleaned up {result.get('cleaned_up', 0)} expired tokens")
+    return result
+
+@router.get("/jupyter-config")
+async def get_jupyter_config(jupyter=Depends(get_jupyter)):
+    """Get current Jupyter configuration"""
+    return jupyter.get_config()
+
+@router.get("/jupyter-reaper/status")
+async def get_jupyter_reaper_status(reaper=Depends(get_reaper)):
+    """Get idle-session reaper state and reclaimed capacity"""
+    return reaper.get_status()
+
+@router.post("/jupyter-reaper/run", dependencies=[Depends(require_admin)])
+async def run_jupyter_reaper(reaper=Depends(get_reaper)):
+    """Run a single idle-session reaping pass immediately"""
+    logger.info("JUPYTER REAPER: Running reaping pass...")
+    result = await reaper.run_once()
+    logger.info(f"JUPYTER REAPER: Culled {result['kernels_culled']} kernels, reclaimed {result['containers_reclaimed']} containers")
+    return result
+
+@router.get("/jupyter-usage")
+async def get_jupyter_usage_status(usage=Depends(get_usage_recorder)):
+    """Get write-behind usage buffer and flush statistics"""
+    return usage.get_status()
+
+@router.get("/jupyter-usage/{request_id}")
+async def get_jupyter_usage(request_id: str, usage=Depends(get_usage_recorder)):
+    """Get durable Jupyter usage for an environment request, including unflushed events"""
+    return await usage.get_usage(request_id)
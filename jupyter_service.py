@@ -5,28 +5,41 @@ from fastapi.responses import RedirectResponse
 import secrets
 import httpx
 from datetime import datetime, timedelta
-from typing import Dict, Optional
-from env_request_service import get_env_request_by_id
-
-# Configuration
-JUPYTER_BASE_URL = "http://10.53.136.65:8888"
-JUPYTER_TOKEN = ""
-PRESIGNED_URL_EXPIRY_MINUTES = 30
-
-# In-memory store for active presigned tokens (use Redis in production)
-active_presigned_tokens: Dict[str, dict] = {}
+from typing import Optional
+from urllib.parse import quote
+from settings import Settings
 
 class JupyterService:
     """Service class for handling Jupyter-related operations"""
 
-    @staticmethod
-    def generate_presigned_url(request_id: str, expiry_minutes: int = PRESIGNED_URL_EXPIRY_MINUTES) -> dict:
-        """Generate a secure presigned URL for Jupyter access"""
-
-        # Verify that the request_id exists
-        env_request = get_env_request_by_id(request_id)
-        if not env_request:
-            raise HTTPException(status_code=404, detail="Environment request not found")
+    def __init__(self, settings: Settings, token_store, usage_recorder=None):
+        self.settings = settings
+        self.base_url = settings.jupyter_base_url
+        # Active presigned tokens, in memory or shared (see token_store)
+        self.tokens = token_store
+        # Durable usage statistics, written behind the request (see session_usage)
+        self.usage = usage_recorder
+        # Shared HTTP client for all calls to the Jupyter REST API (keeps connections alive)
+        self._http_client: Optional[httpx.AsyncClient] = None
+
+    @property
+    def http_client(self) -> httpx.AsyncClient:
+        """Get the shared Jupyter HTTP client, creating it on first use"""
+        if self._http_client is None or self._http_client.is_closed:
+            token = self.settings.jupyter_token
+            headers = {"Authorization": f"token {token}"} if token else {}
+            self._http_client = httpx.AsyncClient(timeout=5.0, headers=headers)
+        return self._http_client
+
+    async def close(self) -> None:
+        """Close the shared Jupyter HTTP client"""
+        if self._http_client is not None:
+            await self._http_client.aclose()
+            self._http_client = None
+
+    def generate_presigned_url(self, env_request, expiry_minutes: Optional[int] = None) -> dict:
+        """Generate a secure presigned URL for Jupyter access to an already looked-up request"""
+        expiry_minutes = expiry_minutes or self.settings.presigned_url_expiry_minutes
 
         # Check if IDE option is jupyter
         if env_request.ide_option != "jupyter":
@@ -37,92 +50,91 @@ class JupyterService:
         expiry_time = datetime.utcnow() + timedelta(minutes=expiry_minutes)
 
         # Store token info
-        active_presigned_tokens[presigned_token] = {
-            "request_id": request_id,
-            "env_name": env_request.env_name,
-            "requested_by": getattr(env_request, "requested_by", "anonymous"),
-            "expiry": expiry_time
-        }
+        self.tokens.put(presigned_token, {
+            "request_id": env_request.request_id,
             "env_name": env_request.env_name,
             "requested_by": getattr(env_request, "requested_by", "anonymous"),
             "created_at": datetime.utcnow(),
             "expires_at": expiry_time,
             "used_count": 0,
-            "last_accessed": None
-        }
+            "last_accessed": None,
+            "backend_url": self.base_url
+        })
+
+        if self.usage:
+            self.usage.record_issued(env_request.request_id)
 
-        # Create the presigned URL (adjust port to match your FastAPI)
-        presigned_url = f"http://10.53.136.65:5000/jupyter-access/{presigned_token}"
+        presigned_url = f"{self.settings.public_base_url}/jupyter-access/{presigned_token}"
 
         return {
             "presigned_url": presigned_url,
             "expires_at": expiry_time.isoformat(),
             "expires_in_minutes": expiry_minutes,
-            "request_id": request_id,
+            "request_id": env_request.request_id,
             "env_name": env_request.env_name
         }
 
-    @staticmethod
-    def validate_and_access_jupyter(presigned_token: str) -> RedirectResponse:
+    def validate_and_access_jupyter(self, presigned_token: str) -> RedirectResponse:
         """Validate presigned token and redirect to Jupyter"""
-
-        if presigned_token not in active_presigned_tokens:
+        token_info = self.tokens.get(presigned_token)
+        if not token_info:
             raise HTTPException(status_code=401, detail="Invalid presigned token")
 
-        token_info = active_presigned_tokens[presigned_token]
-
         # Check if expired
         if datetime.utcnow() > token_info["expires_at"]:
-            del active_presigned_tokens[presigned_token]  # Clean up expired token
+            self.tokens.delete(presigned_token)  # Clean up expired token
             raise HTTPException(status_code=401, detail="Presigned token has expired")
 
         # Update usage statistics
         token_info["used_count"] += 1
         token_info["last_accessed"] = datetime.utcnow()
+        self.tokens.put(presigned_token, token_info)
+        if self.usage:
+            self.usage.record_access(token_info["request_id"], token_info["last_accessed"])
 
         # Create Jupyter URL with authentication token
-        jupyter_url = f"{JUPYTER_BASE_URL}/lab?token={presigned_token}"
+        backend_url = token_info.get("backend_url", self.base_url)
+        notebook_path = self.settings.jupyter_notebook_path
+        if notebook_path:
+            jupyter_url = f"{backend_url}/lab/tree/{quote(notebook_path)}?token={presigned_token}"
+        else:
+            jupyter_url = f"{backend_url}/lab?token={presigned_token}"
 
         return RedirectResponse(url=jupyter_url, status_code=302)
 
-    @staticmethod
-    def check_jupyter_health() -> dict:
-    @staticmethod
-    async def check_jupyter_health() -> dict:
+    async def check_jupyter_health(self) -> dict:
         """Check if Jupyter service is running and accessible"""
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.get(f"{JUPYTER_BASE_URL}/lab", timeout=5.0)
-                return {
-                    "jupyter_running": response.status_code == 200,
-                    "status": "healthy" if response.status_code == 200 else "unhealthy",
-                    "url": JUPYTER_BASE_URL,
-                    "response_time_ms": None  # Could add timing if needed
-                }
+            response = await self.http_client.get(f"{self.base_url}/lab", timeout=5.0)
+            return {
+                "jupyter_running": response.status_code == 200,
+                "status": "healthy" if response.status_code == 200 else "unhealthy",
+                "url": self.base_url,
+                "response_time_ms": None  # Could add timing if needed
+            }
         except httpx.TimeoutException:
             return {
                 "jupyter_running": False,
                 "status": "timeout",
                 "error": "Jupyter service timeout",
-                "url": JUPYTER_BASE_URL
+                "url": self.base_url
             }
         except Exception as e:
             return {
                 "jupyter_running": False,
                 "status": "unhealthy",
                 "error": str(e),
-                "url": JUPYTER_BASE_URL
+                "url": self.base_url
             }
 
-    @staticmethod
-    def get_active_sessions() -> dict:
+    def get_active_sessions(self) -> dict:
         """Get information about active presigned tokens"""
         now = datetime.utcnow()
         active_sessions = []
 
         # Clean up expired tokens and return active ones
         expired_tokens = []
-        for token, info in active_presigned_tokens.items():
+        for token, info in self.tokens.items():
             if now > info["expires_at"]:
                 expired_tokens.append(token)
             else:
@@ -133,67 +145,27 @@ class JupyterService:
                     "requested_by": info["requested_by"],
                     "created_at": info["created_at"].isoformat(),
                     "expires_at": info["expires_at"].isoformat(),
+                    "expires_in_minutes": int((info["expires_at"] - now).total_seconds() / 60),
                     "used_count": info["used_count"],
                     "last_accessed": info["last_accessed"].isoformat() if info["last_accessed"] else None
                 })
 
         # Remove expired tokens
         for token in expired_tokens:
-            del active_presigned_tokens[token]
-
-        return {"active_sessions": active_sessions}
-            "env_name": info["env_name"],
-            "requested_by": info["requested_by"],
-            "created_at": info["created_at"].isoformat(),
-            "expires_at": info["expires_at"].isoformat(),
-            "expires_in_minutes": int((info["expires_at"] - now).total_seconds() / 60),
-            "used_count": info["used_count"],
-            "last_accessed": info["last_accessed"].isoformat() if info["last_accessed"] else None
-        })
-
-    # Remove expired tokens
-    for token in expired_tokens:
-        del active_presigned_tokens[token]
-
-    return {
-        "active_sessions": len(active_sessions),
-        "expired_cleaned": len(expired_tokens),
-        "sessions": active_sessions
-    }
-
-    @staticmethod
-    def revoke_presigned_token(presigned_token: str) -> dict:
-        """Manually revoke a presigned token"""
-        if presigned_token not in active_presigned_tokens:
-            raise HTTPException(status_code=404, detail="Presigned token not found")
-
-        token_info = active_presigned_tokens[presigned_token]
-        del active_presigned_tokens[presigned_token]
+            self.tokens.delete(token)
 
         return {
-            "success": True,
-            "message": "Presigned token revoked successfully",
-            "revoked_token_info": {
-                "request_id": token_info["request_id"],
-                "env_name": token_info["env_name"],
-                "was_used": token_info["used_count"] > 0
-            }
+            "active_sessions": len(active_sessions),
+            "expired_cleaned": len(expired_tokens),
+            "sessions": active_sessions
         }
 
-    @staticmethod
-    def cleanup_expired_tokens() -> dict:
-        """Clean up all expired tokens"""
-        now = datetime.utcnow()
-        expired_tokens = []
-    @staticmethod
-    def revoke_presigned_token(presigned_token: str) -> dict:
+    def revoke_presigned_token(self, presigned_token: str) -> dict:
         """Manually revoke a presigned token"""
-        if presigned_token not in active_presigned_tokens:
+        token_info = self.tokens.delete(presigned_token)
+        if not token_info:
             raise HTTPException(status_code=404, detail="Presigned token not found")
 
-        token_info = active_presigned_tokens[presigned_token]
-        del active_presigned_tokens[presigned_token]
-
         return {
             "success": True,
             "message": "Presigned token revoked successfully",
@@ -204,47 +176,38 @@ class JupyterService:
             }
         }
 
-    @staticmethod
-    def cleanup_expired_tokens() -> dict:
+    def cleanup_expired_tokens(self) -> dict:
         """Clean up all expired tokens"""
         now = datetime.utcnow()
-        expired_tokens = []
-
-        for token, info in active_presigned_tokens.items():
-            if now > info["expires_at"]:
-                expired_tokens.append(token)
+        expired_tokens = [token for token, info in self.tokens.items() if now > info["expires_at"]]
 
         # Remove expired tokens
         for token in expired_tokens:
-            del active_presigned_tokens[token]
+            self.tokens.delete(token)
 
         return {
             "cleaned_up": len(expired_tokens),
-            "remaining_active": len(active_presigned_tokens)
+            "remaining_active": len(self.tokens)
         }
 
-class JupyterConfig:
-    """Configuration class for Jupyter settings"""
-
-    @staticmethod
-    def get_config() -> dict:
+    def get_config(self) -> dict:
         """Get current Jupyter configuration"""
         return {
-            "base_url": JUPYTER_BASE_URL,
-            "default_expiry_minutes": PRESIGNED_URL_EXPIRY_MINUTES,
-            "token_configured": bool(JUPYTER_TOKEN and JUPYTER_TOKEN != "your-secure-jupyter-token-123")
+            "base_url": self.base_url,
+            "default_expiry_minutes": self.settings.presigned_url_expiry_minutes,
+            "notebook_path": self.settings.jupyter_notebook_path,
+            "token_store_backend": self.settings.token_store_backend,
+            "token_configured": bool(self.settings.jupyter_token and self.settings.jupyter_token != "your-secure-jupyter-token-123")
         }
 
-    @staticmethod
-    def update_jupyter_url(new_url: str) -> dict:
+    def update_jupyter_url(self, new_url: str) -> dict:
         """Update Jupyter base URL (for runtime configuration)"""
-        global JUPYTER_BASE_URL
-        old_url = JUPYTER_BASE_URL
-        JUPYTER_BASE_URL = new_url.rstrip('/')
+        old_url = self.base_url
+        self.base_url = new_url.rstrip('/')
 
         return {
             "success": True,
             "message": "Jupyter URL updated",
             "old_url": old_url,
-            "new_url": JUPYTER_BASE_URL
+            "new_url": self.base_url
         }
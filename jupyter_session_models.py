@@ -0,0 +1,16 @@
+from pynamodb.models import Model
+from pynamodb.attributes import UnicodeAttribute, NumberAttribute
+import os
+
+class JupyterSessionModel(Model):
+    """Per-request Jupyter usage counters, written in batches by SessionUsageRecorder"""
+    class Meta:
+        table_name = os.getenv("JUPYTER_SESSION_TABLE", "jupyter_sessions")
+        region = os.getenv("AWS_REGION", "us-east-1")
+        host = os.getenv("DYNAMODB_ENDPOINT_URL", None)
+
+    request_id = UnicodeAttribute(hash_key=True)
+    access_count = NumberAttribute(default=0)
+    presigned_urls_issued = NumberAttribute(default=0)
+    first_accessed = UnicodeAttribute(null=True)
+    last_accessed = UnicodeAttribute(null=True)
@@ -0,0 +1,184 @@
+# -----profiling.py-----
+
+import asyncio
+import cProfile
+import io
+import os
+import pstats
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict
+from datetime import datetime
+from typing import List, Optional
+
+from fastapi import HTTPException
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.requests import Request
+
+from dependencies import is_admin
+from settings import Settings
+
+# Completed profiles kept for GET /admin/profiles/{id}
+MAX_STORED_PROFILES = 20
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class StackSampler:
+    """Samples the stacks of every other thread from a background thread.
+
+    Each sample is folded into a ``thread;outer;...;inner`` key, so the result is
+    the collapsed-stack format flamegraph.pl and speedscope read directly.
+    """
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.samples: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _run(self) -> None:
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame))
+                    frame = frame.f_back
+                stack.append(names.get(thread_id, str(thread_id)))
+                self.samples[";".join(reversed(stack))] += 1
+
+    def start(self) -> "StackSampler":
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> Counter:
+        self._stop.set()
+        self._thread.join()
+        return self.samples
+
+
+def format_collapsed(samples: Counter) -> str:
+    return "".join(f"{stack} {count}\n" for stack, count in samples.most_common())
+
+
+class Profiler:
+    """Runs one profiling session at a time over the live process and keeps the recent results"""
+
+    def __init__(self, settings: Settings):
+        self.settings = settings
+        self.profiles: "OrderedDict[str, dict]" = OrderedDict()
+        self._busy = False
+
+    def _store(self, kind: str, output: str, **details) -> dict:
+        profile = {
+            "profile_id": str(uuid.uuid4()),
+            "kind": kind,
+            "created_at": datetime.utcnow().isoformat(),
+            "output": output,
+            **details
+        }
+        self.profiles[profile["profile_id"]] = profile
+        while len(self.profiles) > MAX_STORED_PROFILES:
+            self.profiles.popitem(last=False)
+        return profile
+
+    def _claim(self) -> None:
+        if self._busy:
+            raise HTTPException(status_code=409, detail="A profiling session is already running")
+        self._busy = True
+
+    async def sample(self, seconds: float, interval_ms: Optional[float] = None) -> dict:
+        """Sample all threads for ``seconds``; output is collapsed stacks"""
+        self._claim()
+        try:
+            interval = (interval_ms or self.settings.profile_sample_interval_ms) / 1000
+            sampler = StackSampler(interval).start()
+            try:
+                await asyncio.sleep(seconds)
+            finally:
+                samples = sampler.stop()
+        finally:
+            self._busy = False
+        return self._store("sample", format_collapsed(samples), seconds=seconds, samples=sum(samples.values()))
+
+    async def cprofile(self, seconds: float, limit: int = 60) -> dict:
+        """Deterministically profile the event loop thread for ``seconds``; output is pstats text"""
+        self._claim()
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+            try:
+                await asyncio.sleep(seconds)
+            finally:
+                profiler.disable()
+        finally:
+            self._busy = False
+        output = io.StringIO()
+        pstats.Stats(profiler, stream=output).sort_stats("cumulative").print_stats(limit)
+        return self._store("cprofile", output.getvalue(), seconds=seconds)
+
+    def get(self, profile_id: str) -> dict:
+        profile = self.profiles.get(profile_id)
+        if profile is None:
+            raise HTTPException(status_code=404, detail=f"Profile not found: {profile_id}")
+        return profile
+
+    def list_profiles(self) -> List[dict]:
+        return [
+            {key: value for key, value in profile.items() if key != "output"}
+            for profile in reversed(self.profiles.values())
+        ]
+
+
+class ProfileMiddleware:
+    """ASGI middleware: sample the process while a request carrying ``X-Profile`` and the admin token runs.
+
+    Requests without the header are handed to the app untouched, so the common
+    path pays for one header lookup and nothing else.
+    """
+
+    def __init__(self, app, profiler: Profiler):
+        self.app = app
+        self.profiler = profiler
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or "x-profile" not in Headers(scope=scope):
+            await self.app(scope, receive, send)
+            return
+        profiler = self.profiler
+        if profiler._busy or not is_admin(profiler.settings, Request(scope)):
+            await self.app(scope, receive, send)
+            return
+
+        profile_id = str(uuid.uuid4())
+
+        async def send_with_profile_id(message):
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message).append("X-Profile-Id", profile_id)
+            await send(message)
+
+        profiler._busy = True
+        started = time.perf_counter()
+        sampler = StackSampler(profiler.settings.profile_request_interval_ms / 1000).start()
+        try:
+            await self.app(scope, receive, send_with_profile_id)
+        finally:
+            samples = sampler.stop()
+            profiler._busy = False
+            profiler._store(
+                "request", format_collapsed(samples),
+                profile_id=profile_id,
+                path=scope["path"],
+                seconds=round(time.perf_counter() - started, 4),
+                samples=sum(samples.values())
+            )
@@ -0,0 +1,185 @@
+# -----rate_limiter.py-----
+
+import logging
+import math
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from fastapi import HTTPException, Request
+
+from settings import Settings
+
+logger = logging.getLogger(__name__)
+
+MAX_IN_MEMORY_BUCKETS = 10000
+
+# Default limits per route as "requests/seconds"; override with RATE_LIMIT_<ROUTE>,
+# e.g. RATE_LIMIT_GENERATE_JUPYTER_URL="10/60"
+DEFAULT_ROUTE_LIMITS = {
+    "create-env-request": "10/60",
+    "list-env-requests": "20/60",
+    "generate-jupyter-url": "5/60",
+    "submit-training-job": "5/60",
+}
+
+
+def parse_limit(limit: str) -> Tuple[int, float]:
+    """Parse "requests/seconds" into (bucket capacity, refill rate per second)"""
+    requests, seconds = limit.split("/", 1)
+    capacity = int(requests)
+    return capacity, capacity / float(seconds)
+
+
+def get_route_limit(route: str) -> Tuple[int, float]:
+    """Get the bucket settings for a route"""
+    env_name = "RATE_LIMIT_" + route.upper().replace("-", "_")
+    return parse_limit(os.getenv(env_name, DEFAULT_ROUTE_LIMITS.get(route, "60/60")))
+
+
+class InMemoryBucketStore:
+    """Token buckets held in this process"""
+
+    def __init__(self):
+        # key -> (tokens, last update, time at which the bucket is full again)
+        self._buckets: Dict[str, Tuple[float, float, float]] = {}
+        self._lock = threading.Lock()
+
+    def take(self, key: str, capacity: int, refill_rate: float, now: float) -> float:
+        """Take one token; return 0 if allowed, otherwise seconds until a token is available"""
+        with self._lock:
+            tokens, updated, _ = self._buckets.get(key, (capacity, now, now))
+            tokens = min(capacity, tokens + (now - updated) * refill_rate)
+
+            retry_after = 0.0
+            if tokens >= 1:
+                tokens -= 1
+            else:
+                retry_after = (1 - tokens) / refill_rate
+            self._buckets[key] = (tokens, now, now + (capacity - tokens) / refill_rate)
+
+            if len(self._buckets) > MAX_IN_MEMORY_BUCKETS:
+                self._evict_full_buckets(now)
+            return retry_after
+
+    def _evict_full_buckets(self, now: float) -> None:
+        """Drop buckets that have refilled completely, they carry no state"""
+        full = [key for key, (_, _, full_at) in self._buckets.items() if full_at <= now]
+        for key in full:
+            del self._buckets[key]
+
+
+class RedisBucketStore:
+    """Token buckets shared by every API process through Redis"""
+
+    # Refill and take atomically on the Redis server
+    TAKE_SCRIPT = """
+    local capacity = tonumber(ARGV[1])
+    local refill_rate = tonumber(ARGV[2])
+    local now = tonumber(ARGV[3])
+    local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+    local tokens = tonumber(bucket[1]) or capacity
+    local updated = tonumber(bucket[2]) or now
+    tokens = math.min(capacity, tokens + math.max(0, now - updated) * refill_rate)
+    local retry_after = 0
+    if tokens >= 1 then
+        tokens = tokens - 1
+    else
+        retry_after = (1 - tokens) / refill_rate
+    end
+    redis.call('HSET', KEYS[1], 'tokens', tokens, 'updated', now)
+    redis.call('EXPIRE', KEYS[1], math.ceil(capacity / refill_rate) + 1)
+    return tostring(retry_after)
+    """
+
+    def __init__(self, url: str):
+        # Only needed for the shared backend, so not imported at module load
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("RATE_LIMIT_BACKEND=redis requires the 'redis' package")
+        self._client = redis.Redis.from_url(url)
+        self._take = self._client.register_script(self.TAKE_SCRIPT)
+
+    def take(self, key: str, capacity: int, refill_rate: float, now: float) -> float:
+        """Take one token; return 0 if allowed, otherwise seconds until a token is available"""
+        return float(self._take(keys=[f"ratelimit:{key}"], args=[capacity, refill_rate, now]))
+
+
+def create_bucket_store(settings: Settings):
+    """Create the bucket store for the configured backend"""
+    if settings.rate_limit_backend == "redis":
+        return RedisBucketStore(settings.redis_url)
+    return InMemoryBucketStore()
+
+
+class RateLimiter:
+    """Per-client, per-route token-bucket rate limiter"""
+
+    def __init__(self, store, enabled: bool = True):
+        self.store = store
+        self.enabled = enabled
+
+    def check(self, route: str, client_keys: List[str]) -> None:
+        """Consume one request from each of the client's buckets on the route, raising 429 when any is exhausted"""
+        if not self.enabled:
+            return
+
+        capacity, refill_rate = get_route_limit(route)
+        for client_key in client_keys:
+            try:
+                retry_after = self.store.take(f"{route}:{client_key}", capacity, refill_rate, time.time())
+            except Exception as e:
+                # Fail open: a broken limiter store must not take the API down
+                logger.error(f"RATE LIMIT: Bucket store error for {route}: {e}")
+                return
+            if retry_after > 0:
+                logger.warning(f"RATE LIMIT: {client_key} exceeded limit on {route}")
+                raise HTTPException(
+                    status_code=429,
+                    detail=f"Too many requests to {route}, retry later",
+                    headers={"Retry-After": str(math.ceil(retry_after))}
+                )
+
+
+def client_ip(request: Request) -> str:
+    """The caller's IP, read from X-Forwarded-For when the connection comes from a trusted proxy.
+
+    The header is walked from the right, skipping trusted proxies, so a client
+    cannot pick its own bucket by prepending addresses. Without TRUSTED_PROXIES
+    the header is ignored; Uvicorn's own ``--proxy-headers`` handling, if used,
+    has already rewritten the connection address by then.
+    """
+    host = request.client.host if request.client else "unknown"
+    trusted = {ip.strip() for ip in request.app.state.settings.trusted_proxies.split(",") if ip.strip()}
+    if host not in trusted:
+        return host
+    forwarded = [ip.strip() for ip in request.headers.get("x-forwarded-for", "").split(",") if ip.strip()]
+    for ip in reversed(forwarded):
+        if ip not in trusted:
+            return ip
+    return forwarded[0] if forwarded else host
+
+
+def user_keys(requested_by: Optional[str]) -> List[str]:
+    """The requested_by bucket, unless the caller is anonymous"""
+    if requested_by and requested_by != "anonymous":
+        return [f"user:{requested_by}"]
+    return []
+
+
+def client_keys(request: Request, requested_by: Optional[str] = None) -> List[str]:
+    """Buckets a request counts against: always the client IP, plus requested_by when known.
+
+    requested_by is caller-supplied, so it only narrows the limit; a client
+    sending a new value on every call is still held by its IP bucket.
+    """
+    return [f"ip:{client_ip(request)}"] + user_keys(requested_by)
+
+
+def rate_limit(route: str):
+    """FastAPI dependency enforcing the rate limit of a route"""
+    def dependency(request: Request) -> None:
+        request.app.state.rate_limiter.check(route, client_keys(request))
+    return dependency
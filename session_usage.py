@@ -0,0 +1,213 @@
+# -----session_usage.py-----
+
+import asyncio
+import logging
+import threading
+from datetime import datetime
+from typing import Dict, Optional
+
+from fastapi.concurrency import run_in_threadpool
+
+from settings import Settings
+
+logger = logging.getLogger(__name__)
+
+
+class SessionUsageRecorder:
+    """Buffers Jupyter usage events in memory and writes them to DynamoDB in batches.
+
+    Recording is a dict update, so /jupyter-access never waits on DynamoDB; the
+    buffer is flushed every ``usage_flush_interval_seconds`` or as soon as
+    ``usage_flush_max_pending`` events are waiting, using atomic ADD updates.
+    """
+
+    def __init__(self, settings: Settings):
+        self.settings = settings
+        self.enabled = settings.usage_stats_enabled
+        # request_id -> {"access_count", "presigned_urls_issued", "first_accessed", "last_accessed"}
+        self._pending: Dict[str, dict] = {}
+        self._pending_events = 0
+        self._lock = threading.Lock()
+        self._flush_requested: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self.stats = {
+            "events_recorded": 0,
+            "events_flushed": 0,
+            "flushes": 0,
+            "flush_failures": 0,
+            "last_flush": None
+        }
+
+    def record_access(self, request_id: str, at: Optional[datetime] = None) -> None:
+        """Record one redirect into Jupyter for a request"""
+        self._record(request_id, "access_count", at or datetime.utcnow())
+
+    def record_issued(self, request_id: str) -> None:
+        """Record one presigned URL generated for a request"""
+        self._record(request_id, "presigned_urls_issued", None)
+
+    def _record(self, request_id: str, counter: str, accessed_at: Optional[datetime]) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            entry = self._pending.setdefault(request_id, {
+                "access_count": 0,
+                "presigned_urls_issued": 0,
+                "first_accessed": None,
+                "last_accessed": None
+            })
+            entry[counter] += 1
+            if accessed_at:
+                entry["first_accessed"] = entry["first_accessed"] or accessed_at
+                entry["last_accessed"] = accessed_at
+            self._pending_events += 1
+            self.stats["events_recorded"] += 1
+            flush_now = self._pending_events >= self.settings.usage_flush_max_pending
+
+        if flush_now and self._flush_requested is not None:
+            self._flush_requested.set()
+
+    def _take_pending(self) -> Dict[str, dict]:
+        with self._lock:
+            batch, self._pending = self._pending, {}
+            self._pending_events = 0
+        return batch
+
+    def _restore_pending(self, batch: Dict[str, dict]) -> None:
+        """Merge a batch that failed to write back into the buffer for the next flush"""
+        with self._lock:
+            for request_id, failed in batch.items():
+                entry = self._pending.setdefault(request_id, dict(failed, access_count=0, presigned_urls_issued=0))
+                entry["access_count"] += failed["access_count"]
+                entry["presigned_urls_issued"] += failed["presigned_urls_issued"]
+                if failed["first_accessed"] and (not entry["first_accessed"] or failed["first_accessed"] < entry["first_accessed"]):
+                    entry["first_accessed"] = failed["first_accessed"]
+                if failed["last_accessed"] and (not entry["last_accessed"] or failed["last_accessed"] > entry["last_accessed"]):
+                    entry["last_accessed"] = failed["last_accessed"]
+                self._pending_events += failed["access_count"] + failed["presigned_urls_issued"]
+
+    @staticmethod
+    def _write_batch(batch: Dict[str, dict]) -> Dict[str, dict]:
+        """Apply a batch with one atomic UpdateItem per request; return the entries that failed"""
+        from jupyter_session_models import JupyterSessionModel
+
+        failed = {}
+        for request_id, entry in batch.items():
+            actions = []
+            if entry["access_count"]:
+                actions.append(JupyterSessionModel.access_count.add(entry["access_count"]))
+            if entry["presigned_urls_issued"]:
+                actions.append(JupyterSessionModel.presigned_urls_issued.add(entry["presigned_urls_issued"]))
+            if entry["first_accessed"]:
+                # Keep the earliest value already stored (if_not_exists)
+                actions.append(JupyterSessionModel.first_accessed.set(
+                    JupyterSessionModel.first_accessed | entry["first_accessed"].isoformat()
+                ))
+            if entry["last_accessed"]:
+                actions.append(JupyterSessionModel.last_accessed.set(entry["last_accessed"].isoformat()))
+            try:
+                JupyterSessionModel(request_id).update(actions=actions)
+            except Exception as e:
+                logger.error(f"USAGE: Failed to write usage for {request_id}: {e}")
+                failed[request_id] = entry
+        return failed
+
+    async def flush(self) -> int:
+        """Write all buffered usage to DynamoDB; return the number of events written"""
+        batch = self._take_pending()
+        if not batch:
+            return 0
+
+        failed = await run_in_threadpool(self._write_batch, batch)
+        if failed:
+            self.stats["flush_failures"] += 1
+            self._restore_pending(failed)
+
+        flushed = sum(
+            entry["access_count"] + entry["presigned_urls_issued"]
+            for request_id, entry in batch.items() if request_id not in failed
+        )
+        self.stats["events_flushed"] += flushed
+        self.stats["flushes"] += 1
+        self.stats["last_flush"] = datetime.utcnow().isoformat()
+        return flushed
+
+    async def run_forever(self) -> None:
+        """Flush on the configured interval, or earlier when the buffer fills up"""
+        while True:
+            try:
+                await asyncio.wait_for(self._flush_requested.wait(), timeout=self.settings.usage_flush_interval_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_requested.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"USAGE: Flush failed: {e}")
+
+    def start(self) -> None:
+        """Start the background flush task"""
+        if self.enabled and (self._task is None or self._task.done()):
+            self._flush_requested = asyncio.Event()
+            self._task = asyncio.create_task(self.run_forever())
+
+    async def stop(self) -> None:
+        """Stop the flush task and write out whatever is still buffered"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        try:
+            await self.flush()
+        except Exception as e:
+            logger.error(f"USAGE: Final flush failed: {e}")
+
+    async def warm_up(self) -> None:
+        """Create the session table connection ahead of the first flush"""
+        if self.enabled:
+            from jupyter_session_models import JupyterSessionModel
+            await run_in_threadpool(JupyterSessionModel.describe_table)
+
+    async def get_usage(self, request_id: str) -> dict:
+        """Stored usage for a request plus the events not yet flushed"""
+        from jupyter_session_models import JupyterSessionModel
+
+        def load():
+            try:
+                return JupyterSessionModel.get(request_id)
+            except JupyterSessionModel.DoesNotExist:
+                return None
+
+        stored = await run_in_threadpool(load)
+        with self._lock:
+            pending = dict(self._pending.get(request_id) or {})
+
+        first_accessed = stored.first_accessed if stored else None
+        last_accessed = stored.last_accessed if stored else None
+        if pending.get("first_accessed") and not first_accessed:
+            first_accessed = pending["first_accessed"].isoformat()
+        if pending.get("last_accessed"):
+            last_accessed = pending["last_accessed"].isoformat()
+
+        return {
+            "request_id": request_id,
+            "access_count": (stored.access_count if stored else 0) + pending.get("access_count", 0),
+            "presigned_urls_issued": (stored.presigned_urls_issued if stored else 0) + pending.get("presigned_urls_issued", 0),
+            "first_accessed": first_accessed,
+            "last_accessed": last_accessed,
+            "pending_events": pending.get("access_count", 0) + pending.get("presigned_urls_issued", 0)
+        }
+
+    def get_status(self) -> dict:
+        """Buffer and flush statistics"""
+        return {
+            "enabled": self.enabled,
+            "flush_interval_seconds": self.settings.usage_flush_interval_seconds,
+            "flush_max_pending": self.settings.usage_flush_max_pending,
+            "pending_events": self._pending_events,
+            "pending_requests": len(self._pending),
+            **self.stats
+        }
@@ -0,0 +1,196 @@
+# -----settings.py-----
+
+import os
+from dataclasses import dataclass, field
+from typing import List
+
+from catalog_service import DEFAULT_CATALOG_PATH
+
+
+def _env_bool(name: str, default: str) -> bool:
+    return os.getenv(name, default).lower() == "true"
+
+
+@dataclass
+class Settings:
+    """Application configuration; every backend is chosen from here by create_app"""
+
+    # Jupyter
+    jupyter_base_url: str = "http://10.53.136.65:8888"
+    jupyter_token: str = ""
+    # Base URL of this API, used to build presigned links
+    public_base_url: str = "http://10.53.136.65:5000"
+    presigned_url_expiry_minutes: int = 30
+    # Notebook opened after redirect, relative to the Jupyter root ("" opens the Lab home)
+    jupyter_notebook_path: str = ""
+
+    # Pluggable backends
+    token_store_backend: str = "memory"  # "memory" or "redis"
+    db_mode: str = "async"  # "async" (DynamoDB calls in a thread pool) or "sync" (inline)
+    rate_limit_backend: str = "memory"  # "memory" or "redis"
+    redis_url: str = "redis://localhost:6379/0"
+
+    rate_limit_enabled: bool = True
+    # Reverse proxies (comma-separated IPs) whose X-Forwarded-For is trusted for the client IP
+    trusted_proxies: str = ""
+
+    # Idle-session reaper
+    reaper_enabled: bool = True
+    reaper_interval_seconds: int = 60
+    kernel_idle_timeout_minutes: int = 30
+    container_idle_timeout_minutes: int = 60
+    # "stop" frees the whole container, "restart" recycles it to release kernel memory
+    idle_container_action: str = "stop"
+    # How long a request waits for a reclaimed container's Jupyter API to answer after starting it
+    container_start_timeout_seconds: int = 60
+    container_runtime: str = "podman"
+    container_runner: str = "podman"  # "podman" or "fake" (in-memory, for development and tests)
+    jupyter_container_name: str = "xgboost-jupyter"
+    # "url=container" pairs separated by commas; empty means jupyter_base_url only
+    jupyter_backends: str = ""
+
+    # Write-behind Jupyter usage statistics
+    usage_stats_enabled: bool = True
+    usage_flush_interval_seconds: int = 10
+    usage_flush_max_pending: int = 500
+
+    # Admission control: slots per instance type, e.g. "small=8,medium=4,large=2" (empty disables it)
+    instance_capacity: str = ""
+
+    # How long the dashboard stats snapshot is served before re-reading the counters
+    stats_cache_ttl_seconds: int = 30
+
+    # Headless training jobs (POST /env-request/{id}/jobs)
+    training_workspace_dir: str = "/home/ssm-user/jupytercontainer-xgboost/workspace"
+    training_jobs_dir: str = "/home/ssm-user/jupytercontainer-xgboost/training_jobs"
+    # Jobs run in a container of the request's framework image (TRAINING_IMAGE when it has none);
+    # the interpreter inside it must have papermill for notebook jobs
+    training_image: str = "localhost/xgboost-container:latest"
+    training_python: str = "python"
+    # Network of job containers; "none" also keeps jobs away from the host's instance metadata credentials
+    training_network: str = "none"
+    training_max_jobs: int = 2
+    # Cores reserved for training jobs, taken from the top of the host's cores (0 = all)
+    training_cpu_budget: int = 0
+    training_default_nthread: int = 2
+    training_job_timeout_minutes: int = 240
+    # Host variables passed into job containers (comma-separated); nothing else from the
+    # API environment (AWS credentials, ADMIN_TOKEN, REDIS_URL...) reaches a job
+    training_env_passthrough: str = ""
+    # Seconds between SIGTERM and SIGKILL when a job is cancelled or times out (podman stop -t)
+    training_kill_grace_seconds: int = 10
+
+    # Dataset uploads into the volume mounted at /app/data in the notebooks
+    datasets_dir: str = "/home/ssm-user/jupytercontainer-xgboost/datasets"
+    dataset_chunk_size_mb: int = 8
+    dataset_max_upload_gb: int = 50
+    # Unfinished uploads with no chunk received for this long are deleted (0 keeps them)
+    dataset_upload_expiry_hours: int = 24
+
+    # In-process search index over env requests
+    search_index_enabled: bool = True
+    search_scan_page_size: int = 500
+
+    # Archival of terminal requests: expires_at is set this many days after they end (0 disables it)
+    archive_enabled: bool = True
+    archive_after_days: int = 90
+    archive_interval_minutes: int = 60
+    archive_batch_size: int = 1000
+    # Local stand-in for the archive bucket
+    archive_dir: str = "/home/ssm-user/jupytercontainer-xgboost/archive"
+
+    # Allowed images, IDEs, instance types and their combinations
+    catalog_path: str = DEFAULT_CATALOG_PATH
+
+    # Admin endpoints (profiling) require this as X-Admin-Token; empty disables them
+    admin_token: str = ""
+    profile_max_seconds: int = 60
+    profile_sample_interval_ms: float = 5.0
+    # Finer interval for single-request profiles (X-Profile header)
+    profile_request_interval_ms: float = 1.0
+
+    # Graceful shutdown: uvicorn's deadline for in-flight requests (timeout_graceful_shutdown), and where in-memory tokens survive a restart ("" disables it)
+    shutdown_drain_seconds: int = 20
+    token_snapshot_path: str = "/home/ssm-user/jupytercontainer-xgboost/token_store.snapshot"
+
+    # Framework image pre-pull/build: podman connection names ("" = this host only)
+    image_sync_enabled: bool = True
+    image_sync_interval_minutes: int = 60
+    image_hosts: str = ""
+    # Registry repository used as a shared build layer cache (--cache-from/--cache-to)
+    image_cache_repo: str = ""
+    image_build_timeout_minutes: int = 60
+    image_max_parallel_pulls: int = 2
+
+    warm_up_timeout_seconds: int = 10
+    cors_origins: List[str] = field(default_factory=lambda: ["*"])
+
+    @classmethod
+    def from_env(cls) -> "Settings":
+        """Build settings from environment variables, falling back to the defaults"""
+        defaults = cls()
+        return cls(
+            jupyter_base_url=os.getenv("JUPYTER_BASE_URL", defaults.jupyter_base_url).rstrip("/"),
+            jupyter_token=os.getenv("JUPYTER_TOKEN", defaults.jupyter_token),
+            public_base_url=os.getenv("PUBLIC_BASE_URL", defaults.public_base_url).rstrip("/"),
+            presigned_url_expiry_minutes=int(os.getenv("PRESIGNED_URL_EXPIRY_MINUTES", defaults.presigned_url_expiry_minutes)),
+            jupyter_notebook_path=os.getenv("JUPYTER_NOTEBOOK_PATH", defaults.jupyter_notebook_path),
+            token_store_backend=os.getenv("TOKEN_STORE_BACKEND", defaults.token_store_backend),
+            db_mode=os.getenv("DB_MODE", defaults.db_mode),
+            rate_limit_backend=os.getenv("RATE_LIMIT_BACKEND", defaults.rate_limit_backend),
+            redis_url=os.getenv("REDIS_URL", defaults.redis_url),
+            rate_limit_enabled=_env_bool("RATE_LIMIT_ENABLED", "true"),
+            trusted_proxies=os.getenv("TRUSTED_PROXIES", defaults.trusted_proxies),
+            reaper_enabled=_env_bool("JUPYTER_REAPER_ENABLED", "true"),
+            reaper_interval_seconds=int(os.getenv("JUPYTER_REAPER_INTERVAL_SECONDS", defaults.reaper_interval_seconds)),
+            kernel_idle_timeout_minutes=int(os.getenv("JUPYTER_KERNEL_IDLE_MINUTES", defaults.kernel_idle_timeout_minutes)),
+            container_idle_timeout_minutes=int(os.getenv("JUPYTER_CONTAINER_IDLE_MINUTES", defaults.container_idle_timeout_minutes)),
+            idle_container_action=os.getenv("JUPYTER_IDLE_CONTAINER_ACTION", defaults.idle_container_action),
+            container_start_timeout_seconds=int(os.getenv("JUPYTER_CONTAINER_START_TIMEOUT_SECONDS", defaults.container_start_timeout_seconds)),
+            container_runtime=os.getenv("CONTAINER_RUNTIME", defaults.container_runtime),
+            container_runner=os.getenv("CONTAINER_RUNNER", defaults.container_runner),
+            jupyter_container_name=os.getenv("JUPYTER_CONTAINER_NAME", defaults.jupyter_container_name),
+            jupyter_backends=os.getenv("JUPYTER_BACKENDS", defaults.jupyter_backends),
+            usage_stats_enabled=_env_bool("USAGE_STATS_ENABLED", "true"),
+            usage_flush_interval_seconds=int(os.getenv("USAGE_FLUSH_INTERVAL_SECONDS", defaults.usage_flush_interval_seconds)),
+            usage_flush_max_pending=int(os.getenv("USAGE_FLUSH_MAX_PENDING", defaults.usage_flush_max_pending)),
+            instance_capacity=os.getenv("INSTANCE_CAPACITY", defaults.instance_capacity),
+            stats_cache_ttl_seconds=int(os.getenv("STATS_CACHE_TTL_SECONDS", defaults.stats_cache_ttl_seconds)),
+            training_workspace_dir=os.getenv("TRAINING_WORKSPACE_DIR", defaults.training_workspace_dir),
+            training_jobs_dir=os.getenv("TRAINING_JOBS_DIR", defaults.training_jobs_dir),
+            training_image=os.getenv("TRAINING_IMAGE", defaults.training_image),
+            training_python=os.getenv("TRAINING_PYTHON", defaults.training_python),
+            training_network=os.getenv("TRAINING_NETWORK", defaults.training_network),
+            training_max_jobs=int(os.getenv("TRAINING_MAX_JOBS", defaults.training_max_jobs)),
+            training_cpu_budget=int(os.getenv("TRAINING_CPU_BUDGET", defaults.training_cpu_budget)),
+            training_default_nthread=int(os.getenv("TRAINING_DEFAULT_NTHREAD", defaults.training_default_nthread)),
+            training_job_timeout_minutes=int(os.getenv("TRAINING_JOB_TIMEOUT_MINUTES", defaults.training_job_timeout_minutes)),
+            training_env_passthrough=os.getenv("TRAINING_ENV_PASSTHROUGH", defaults.training_env_passthrough),
+            training_kill_grace_seconds=int(os.getenv("TRAINING_KILL_GRACE_SECONDS", defaults.training_kill_grace_seconds)),
+            datasets_dir=os.getenv("DATASETS_DIR", defaults.datasets_dir),
+            dataset_chunk_size_mb=int(os.getenv("DATASET_CHUNK_SIZE_MB", defaults.dataset_chunk_size_mb)),
+            dataset_max_upload_gb=int(os.getenv("DATASET_MAX_UPLOAD_GB", defaults.dataset_max_upload_gb)),
+            dataset_upload_expiry_hours=int(os.getenv("DATASET_UPLOAD_EXPIRY_HOURS", defaults.dataset_upload_expiry_hours)),
+            search_index_enabled=_env_bool("SEARCH_INDEX_ENABLED", "true"),
+            search_scan_page_size=int(os.getenv("SEARCH_SCAN_PAGE_SIZE", defaults.search_scan_page_size)),
+            archive_enabled=_env_bool("ARCHIVE_ENABLED", "true"),
+            archive_after_days=int(os.getenv("ARCHIVE_AFTER_DAYS", defaults.archive_after_days)),
+            archive_interval_minutes=int(os.getenv("ARCHIVE_INTERVAL_MINUTES", defaults.archive_interval_minutes)),
+            archive_batch_size=int(os.getenv("ARCHIVE_BATCH_SIZE", defaults.archive_batch_size)),
+            archive_dir=os.getenv("ARCHIVE_DIR", defaults.archive_dir),
+            catalog_path=os.getenv("CATALOG_PATH", defaults.catalog_path),
+            admin_token=os.getenv("ADMIN_TOKEN", defaults.admin_token),
+            profile_max_seconds=int(os.getenv("PROFILE_MAX_SECONDS", defaults.profile_max_seconds)),
+            profile_sample_interval_ms=float(os.getenv("PROFILE_SAMPLE_INTERVAL_MS", defaults.profile_sample_interval_ms)),
+            profile_request_interval_ms=float(os.getenv("PROFILE_REQUEST_INTERVAL_MS", defaults.profile_request_interval_ms)),
+            shutdown_drain_seconds=int(os.getenv("SHUTDOWN_DRAIN_SECONDS", defaults.shutdown_drain_seconds)),
+            token_snapshot_path=os.getenv("TOKEN_SNAPSHOT_PATH", defaults.token_snapshot_path),
+            image_sync_enabled=_env_bool("IMAGE_SYNC_ENABLED", "true"),
+            image_sync_interval_minutes=int(os.getenv("IMAGE_SYNC_INTERVAL_MINUTES", defaults.image_sync_interval_minutes)),
+            image_hosts=os.getenv("IMAGE_HOSTS", defaults.image_hosts),
+            image_cache_repo=os.getenv("IMAGE_CACHE_REPO", defaults.image_cache_repo),
+            image_build_timeout_minutes=int(os.getenv("IMAGE_BUILD_TIMEOUT_MINUTES", defaults.image_build_timeout_minutes)),
+            image_max_parallel_pulls=int(os.getenv("IMAGE_MAX_PARALLEL_PULLS", defaults.image_max_parallel_pulls)),
+            warm_up_timeout_seconds=int(os.getenv("WARM_UP_TIMEOUT_SECONDS", defaults.warm_up_timeout_seconds)),
+            cors_origins=[o.strip() for o in os.getenv("CORS_ORIGINS", "*").split(",") if o.strip()],
+        )
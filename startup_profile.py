@@ -0,0 +1,50 @@
+# -----startup_profile.py-----
+"""Import-time profile of the API module.
+
+Runs ``python -X importtime -c "import main"`` in a fresh interpreter and
+prints the slowest imports, e.g.::
+
+    python startup_profile.py --module main --top 25
+"""
+
+import argparse
+import subprocess
+import sys
+from typing import List, Tuple
+
+
+def profile_imports(module: str) -> List[Tuple[str, int, int]]:
+    """Import a module in a clean interpreter and return (name, self_us, cumulative_us) rows"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr}")
+
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        rows.append((name.rstrip(), int(self_us), int(cumulative_us)))
+    return rows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Show the slowest imports of the API module")
+    parser.add_argument("--module", default="main")
+    parser.add_argument("--top", type=int, default=20)
+    args = parser.parse_args()
+
+    rows = profile_imports(args.module)
+    total_us = max((cumulative for _, _, cumulative in rows), default=0)
+    print(f"Total import time for {args.module}: {total_us / 1000:.1f} ms")
+    print(f"{'cumulative ms':>14} {'self ms':>9}  module")
+    for name, self_us, cumulative_us in sorted(rows, key=lambda r: r[2], reverse=True)[:args.top]:
+        print(f"{cumulative_us / 1000:>14.1f} {self_us / 1000:>9.1f}  {name}")
+
+
+if __name__ == "__main__":
+    main()
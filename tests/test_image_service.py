@@ -0,0 +1,135 @@
+import asyncio
+import json
+
+import pytest
+
+from catalog_service import configure_catalog
+from container_runner import CommandResult, FakeRunner
+from image_service import BUILD_HASH_LABEL, ImageService
+from settings import Settings
+
+BASE = "localhost/ds-base:latest"
+VARIANTS = {"xgboost": "localhost/xgboost-container:latest", "pytorch": "localhost/pytorch-container:latest"}
+
+
+@pytest.fixture
+def context(tmp_path):
+    """A catalog with a shared base and two framework variants built from tmp_path/ctx"""
+    ctx = tmp_path / "ctx"
+    ctx.mkdir()
+    (ctx / "Containerfile.base").write_text("FROM python:3.11-slim\n")
+    (ctx / "Containerfile").write_text("ARG BASE_IMAGE\nFROM ${BASE_IMAGE}\nARG FRAMEWORK\n")
+    catalog = {
+        "instance_types": {"small": {"label": "Small"}},
+        "ides": {"jupyter": {"label": "Jupyter", "instance_types": ["small"]}},
+        "images": {
+            key: {"label": key, "image": image, "ides": ["jupyter"], "instance_types": ["small"]}
+            for key, image in VARIANTS.items()
+        },
+        "image_build": {
+            "context": "ctx",
+            "base_image": BASE,
+            "base_containerfile": "Containerfile.base",
+            "containerfile": "Containerfile",
+        },
+    }
+    path = tmp_path / "catalog.json"
+    path.write_text(json.dumps(catalog))
+    configure_catalog(str(path))
+    return ctx
+
+
+def built(runner):
+    """(host, image) of every build since the last call"""
+    builds = [(host, args[args.index("-t") + 1]) for host, args in runner.commands if args[0] == "build"]
+    runner.commands.clear()
+    return builds
+
+
+def make_service(runner, hosts="a,b"):
+    return ImageService(Settings(image_hosts=hosts), runner)
+
+
+def test_builds_base_then_variants_on_every_host(context):
+    runner = FakeRunner()
+    status = asyncio.run(make_service(runner).sync())
+
+    builds = built(runner)
+    for host in ("a", "b"):
+        host_builds = [image for build_host, image in builds if build_host == host]
+        assert host_builds[0] == BASE
+        assert sorted(host_builds[1:]) == sorted(VARIANTS.values())
+    assert all(entry["ready"] for entry in status["images"].values())
+    assert set(status["images"]["xgboost"]["hosts"]) == {"a", "b"}
+    assert runner.images["a"][VARIANTS["xgboost"]]["labels"][BUILD_HASH_LABEL]
+
+
+def test_unchanged_inputs_are_not_rebuilt(context):
+    runner = FakeRunner()
+    service = make_service(runner)
+
+    async def scenario():
+        await service.sync()
+        built(runner)
+        await service.sync()
+        return built(runner)
+
+    assert asyncio.run(scenario()) == []
+
+
+def test_changed_containerfile_rebuilds_variants_only(context):
+    runner = FakeRunner()
+    service = make_service(runner)
+
+    async def scenario():
+        await service.sync()
+        built(runner)
+        (context / "Containerfile").write_text("ARG BASE_IMAGE\nFROM ${BASE_IMAGE}\nARG FRAMEWORK\nRUN true\n")
+        await service.sync()
+        return built(runner)
+
+    rebuilt = asyncio.run(scenario())
+    assert sorted(rebuilt) == sorted((host, image) for host in ("a", "b") for image in VARIANTS.values())
+
+
+def test_changed_base_cascades_to_variants(context):
+    runner = FakeRunner()
+    service = make_service(runner, hosts="a")
+
+    async def scenario():
+        await service.sync()
+        built(runner)
+        (context / "Containerfile.base").write_text("FROM python:3.12-slim\n")
+        await service.sync()
+        return built(runner)
+
+    images = [image for _, image in asyncio.run(scenario())]
+    assert images[0] == BASE
+    assert sorted(images[1:]) == sorted(VARIANTS.values())
+
+
+def test_readiness_is_tracked_per_host(context):
+    class BrokenHostRunner(FakeRunner):
+        async def run(self, args, host="", timeout=60, log=None):
+            if host == "b" and args[0] == "build" and VARIANTS["pytorch"] in args:
+                self.commands.append((host, list(args)))
+                return CommandResult(1, "no space left on device")
+            return await super().run(args, host, timeout, log)
+
+    status = asyncio.run(make_service(BrokenHostRunner()).sync())
+
+    pytorch = status["images"]["pytorch"]
+    assert pytorch["hosts"]["a"]["state"] == "ready"
+    assert pytorch["hosts"]["b"]["state"] == "failed"
+    assert "no space left" in pytorch["hosts"]["b"]["error"]
+    assert not pytorch["ready"]
+    assert status["images"]["xgboost"]["ready"]
+
+
+def test_missing_build_inputs_fail_without_building(context):
+    (context / "Containerfile.base").unlink()
+    runner = FakeRunner()
+    status = asyncio.run(make_service(runner, hosts="a").sync())
+
+    assert built(runner) == []
+    assert all(entry["hosts"]["a"]["state"] == "failed" for entry in status["images"].values())
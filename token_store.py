@@ -0,0 +1,145 @@
+# -----token_store.py-----
+
+import json
+import logging
+import marshal
+import os
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from settings import Settings
+
+logger = logging.getLogger(__name__)
+
+# Token info fields stored as datetimes
+DATETIME_FIELDS = ("created_at", "expires_at", "last_accessed")
+
+
+class InMemoryTokenStore:
+    """Presigned tokens held in this process"""
+
+    def __init__(self):
+        self._tokens: Dict[str, dict] = {}
+
+    def get(self, token: str) -> Optional[dict]:
+        return self._tokens.get(token)
+
+    def put(self, token: str, info: dict) -> None:
+        self._tokens[token] = info
+
+    def delete(self, token: str) -> Optional[dict]:
+        return self._tokens.pop(token, None)
+
+    def items(self) -> List[Tuple[str, dict]]:
+        return list(self._tokens.items())
+
+    def __len__(self) -> int:
+        return len(self._tokens)
+
+
+class RedisTokenStore:
+    """Presigned tokens shared by every API process through Redis, expiring with the token"""
+
+    KEY_PREFIX = "jupyter-token:"
+
+    def __init__(self, url: str):
+        # Only needed for the shared backend, so not imported at module load
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("TOKEN_STORE_BACKEND=redis requires the 'redis' package")
+        self._client = redis.Redis.from_url(url, decode_responses=True)
+
+    @staticmethod
+    def _encode(info: dict) -> str:
+        return json.dumps({
+            key: value.isoformat() if key in DATETIME_FIELDS and value else value
+            for key, value in info.items()
+        })
+
+    @staticmethod
+    def _decode(raw: str) -> dict:
+        info = json.loads(raw)
+        for key in DATETIME_FIELDS:
+            if info.get(key):
+                info[key] = datetime.fromisoformat(info[key])
+        return info
+
+    def get(self, token: str) -> Optional[dict]:
+        raw = self._client.get(self.KEY_PREFIX + token)
+        return self._decode(raw) if raw else None
+
+    def put(self, token: str, info: dict) -> None:
+        ttl_seconds = max(1, int((info["expires_at"] - datetime.utcnow()).total_seconds()))
+        self._client.set(self.KEY_PREFIX + token, self._encode(info), ex=ttl_seconds)
+
+    def delete(self, token: str) -> Optional[dict]:
+        info = self.get(token)
+        self._client.delete(self.KEY_PREFIX + token)
+        return info
+
+    def items(self) -> List[Tuple[str, dict]]:
+        keys = list(self._client.scan_iter(match=self.KEY_PREFIX + "*", count=500))
+        if not keys:
+            return []
+        return [
+            (key[len(self.KEY_PREFIX):], self._decode(raw))
+            for key, raw in zip(keys, self._client.mget(keys))
+            if raw
+        ]
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self._client.scan_iter(match=self.KEY_PREFIX + "*", count=500))
+
+
+# Header of token snapshot files; bump the version when the layout changes
+SNAPSHOT_MAGIC = b"JTS1"
+
+
+def save_snapshot(store: InMemoryTokenStore, path: str) -> int:
+    """Write unexpired tokens to a marshal snapshot (datetimes as epoch seconds); return the count"""
+    now = datetime.utcnow()
+    tokens = {
+        token: {key: value.timestamp() if key in DATETIME_FIELDS and value else value for key, value in info.items()}
+        for token, info in store.items()
+        if info["expires_at"] > now
+    }
+    tmp_path = path + ".tmp"
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "wb") as f:
+        f.write(SNAPSHOT_MAGIC)
+        marshal.dump(tokens, f)
+    os.replace(tmp_path, path)
+    return len(tokens)
+
+
+def load_snapshot(store: InMemoryTokenStore, path: str) -> int:
+    """Restore unexpired tokens from a snapshot and delete it, so revoked tokens cannot come back later"""
+    if not os.path.exists(path):
+        return 0
+    try:
+        with open(path, "rb") as f:
+            if f.read(len(SNAPSHOT_MAGIC)) != SNAPSHOT_MAGIC:
+                raise ValueError("not a token snapshot")
+            tokens = marshal.load(f)
+    except (OSError, ValueError, EOFError, TypeError) as e:
+        logger.error(f"TOKENS: Ignoring unreadable snapshot {path}: {e}")
+        return 0
+    finally:
+        os.remove(path)
+
+    now = datetime.utcnow()
+    restored = 0
+    for token, info in tokens.items():
+        info = {key: datetime.fromtimestamp(value) if key in DATETIME_FIELDS and value else value for key, value in info.items()}
+        if info["expires_at"] > now:
+            store.put(token, info)
+            restored += 1
+    return restored
+
+
+def create_token_store(settings: Settings):
+    """Create the presigned token store for the configured backend"""
+    if settings.token_store_backend == "redis":
+        return RedisTokenStore(settings.redis_url)
+    return InMemoryTokenStore()
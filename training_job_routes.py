@@ -0,0 +1,89 @@
+# -----training_job_routes.py-----
+
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import FileResponse, StreamingResponse
+from dependencies import get_capacity, get_env_requests, get_rate_limiter, get_training_jobs
+from rate_limiter import client_keys, user_keys
+from training_job_schemas import TrainingJobCreate
+import logging
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+# ====================================
+# HEADLESS TRAINING JOB ENDPOINTS
+# ====================================
+
+@router.post("/env-request/{request_id}/jobs")
+async def submit_training_job(
+    request_id: str,
+    data: TrainingJobCreate,
+    request: Request,
+    env_requests=Depends(get_env_requests),
+    rate_limiter=Depends(get_rate_limiter),
+    capacity=Depends(get_capacity),
+    training_jobs=Depends(get_training_jobs),
+):
+    """Submit a training script or notebook for headless execution in a job container"""
+    # The IP bucket is checked before the lookup so a flood never reaches DynamoDB
+    rate_limiter.check("submit-training-job", client_keys(request))
+    env_request = await env_requests.get(request_id)
+    if not env_request:
+        raise HTTPException(status_code=404, detail=f"Environment request not found: {request_id}")
+    rate_limiter.check("submit-training-job", user_keys(env_request.requested_by))
+    await capacity.ensure_admitted(request_id, env_request.instance_type)
+
+    logger.info(f"TRAINING: Submitting {data.script_path} for request: {request_id}")
+    return training_jobs.submit(request_id, data, env_request.framework_option)
+
+@router.get("/env-request/{request_id}/jobs")
+async def list_training_jobs(request_id: str, training_jobs=Depends(get_training_jobs)):
+    """List the training jobs of an environment request"""
+    return training_jobs.list_jobs(request_id)
+
+@router.get("/env-request/{request_id}/jobs/{job_id}")
+async def get_training_job(request_id: str, job_id: str, training_jobs=Depends(get_training_jobs)):
+    """Get state, exit code and queue position of a training job"""
+    return training_jobs.describe(training_jobs.get(job_id, request_id))
+
+@router.delete("/env-request/{request_id}/jobs/{job_id}")
+async def cancel_training_job(request_id: str, job_id: str, training_jobs=Depends(get_training_jobs)):
+    """Cancel a queued or running training job"""
+    training_jobs.get(job_id, request_id)
+    return await training_jobs.cancel(job_id)
+
+@router.get("/env-request/{request_id}/jobs/{job_id}/logs")
+async def get_training_job_logs(
+    request_id: str,
+    job_id: str,
+    offset: int = 0,
+    follow: bool = False,
+    training_jobs=Depends(get_training_jobs),
+):
+    """Job output from a byte offset; follow=true streams it until the job finishes"""
+    job = training_jobs.get(job_id, request_id)
+    if follow:
+        return StreamingResponse(training_jobs.follow_log(job, offset), media_type="text/plain")
+    return training_jobs.read_log(job, offset)
+
+@router.get("/env-request/{request_id}/jobs/{job_id}/artifacts")
+async def list_training_job_artifacts(request_id: str, job_id: str, training_jobs=Depends(get_training_jobs)):
+    """List files the job wrote to its ARTIFACTS_DIR"""
+    return training_jobs.list_artifacts(training_jobs.get(job_id, request_id))
+
+@router.get("/env-request/{request_id}/jobs/{job_id}/artifacts/{name:path}")
+async def download_training_job_artifact(
+    request_id: str,
+    job_id: str,
+    name: str,
+    training_jobs=Depends(get_training_jobs),
+):
+    """Download one artifact of a training job"""
+    job = training_jobs.get(job_id, request_id)
+    return FileResponse(training_jobs.artifact_path(job, name))
+
+@router.get("/training-jobs/status")
+async def get_training_pool_status(training_jobs=Depends(get_training_jobs)):
+    """Running and queued jobs and core allocation of the training pool"""
+    return training_jobs.get_status()
@@ -0,0 +1,13 @@
+# training_job_schemas.py
+
+from pydantic import BaseModel, Field
+from typing import Any, Dict, Optional
+
+class TrainingJobCreate(BaseModel):
+    # .py script or .ipynb notebook, relative to the training workspace
+    script_path: str = Field(..., example="notebooks/train_xgboost.ipynb")
+    # Notebook parameters (papermill) or JOB_PARAMETERS JSON for scripts
+    parameters: Dict[str, Any] = {}
+    # CPU threads (and pinned cores) for the job; defaults to TRAINING_DEFAULT_NTHREAD
+    nthread: Optional[int] = Field(None, ge=1, example=4)
+    timeout_minutes: Optional[int] = Field(None, ge=1)
@@ -0,0 +1,357 @@
+# -----training_job_service.py-----
+
+import asyncio
+import json
+import logging
+import os
+import uuid
+from collections import OrderedDict, deque
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from fastapi import HTTPException
+
+from catalog_service import get_catalog, split_frameworks
+from settings import Settings
+from training_job_schemas import TrainingJobCreate
+
+logger = logging.getLogger(__name__)
+
+FINISHED_STATES = {"succeeded", "failed", "cancelled", "timed_out"}
+
+# Environment variables honoured by XGBoost, NumPy/BLAS and most ML libraries
+THREAD_ENV_VARS = ("NTHREAD", "OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS")
+
+MAX_FINISHED_JOBS = 500
+
+# Where the workspace and the job directory are mounted inside job containers
+CONTAINER_WORKSPACE = "/workspace"
+CONTAINER_JOB_DIR = "/job"
+
+# Attempts at stopping a job container that is still starting or ignores the first stop
+STOP_ATTEMPTS = 5
+
+
+def _usable_cores(budget: int) -> List[int]:
+    """Cores the pool may pin jobs to: the highest-numbered ``budget`` cores (0 = all)"""
+    if hasattr(os, "sched_getaffinity"):
+        cores = sorted(os.sched_getaffinity(0))
+    else:
+        cores = list(range(os.cpu_count() or 1))
+    return cores[-budget:] if budget > 0 else cores
+
+
+def resolve_inside(root: Path, relative: str) -> Path:
+    """Resolve a user-supplied path, refusing anything outside root"""
+    path = (root / relative).resolve()
+    if path != root and root not in path.parents:
+        raise HTTPException(status_code=400, detail=f"Path escapes the workspace: {relative}")
+    return path
+
+
+class TrainingJobRunner:
+    """Runs training scripts and notebooks headless on a bounded pool of job containers.
+
+    Each job runs in a throwaway container of its request's framework image with
+    only the workspace and its own job directory mounted, so workspace code never
+    runs on the API host. At most ``training_max_jobs`` jobs run at once and each
+    is pinned (``--cpuset-cpus``) to its own ``nthread`` cores out of the training
+    CPU budget, so training never shares cores with another job. Jobs wait in FIFO
+    order until their cores are free. Output goes to
+    ``<training_jobs_dir>/<job_id>/job.log`` and artifacts to the job's ``output``
+    directory.
+    """
+
+    def __init__(self, settings: Settings, runner):
+        self.settings = settings
+        self.runner = runner
+        self.workspace = Path(settings.training_workspace_dir).resolve()
+        self.jobs_dir = Path(settings.training_jobs_dir).resolve()
+        self.cores = _usable_cores(settings.training_cpu_budget)
+        self._free_cores = set(self.cores)
+        self._running = 0
+        self._waiting: deque = deque()
+        self._condition: Optional[asyncio.Condition] = None
+        self.jobs: "OrderedDict[str, dict]" = OrderedDict()
+        # Set to stop a running job's container (cancel or shutdown)
+        self._stop_requested: Dict[str, asyncio.Event] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+
+    def _in_container(self, path: str) -> str:
+        return str(Path(CONTAINER_WORKSPACE) / Path(path).relative_to(self.workspace))
+
+    def _command(self, job: dict) -> List[str]:
+        """Command run inside the job container"""
+        script = self._in_container(job["script"])
+        if script.endswith(".ipynb"):
+            command = [
+                self.settings.training_python, "-m", "papermill", script,
+                f"{CONTAINER_JOB_DIR}/output/{os.path.basename(script)}",
+                "--cwd", os.path.dirname(script), "--log-output",
+                "-p", "nthread", str(job["nthread"]),
+            ]
+            if job["parameters"]:
+                # JSON is valid YAML, so parameters keep their types
+                command += ["-y", json.dumps(job["parameters"])]
+            return command
+        return [self.settings.training_python, script]
+
+    def _environment(self, job: dict) -> Dict[str, str]:
+        """Variables set in the job container; it inherits nothing else from the API"""
+        env = {name: str(job["nthread"]) for name in THREAD_ENV_VARS}
+        env["ARTIFACTS_DIR"] = f"{CONTAINER_JOB_DIR}/output"
+        env["JOB_PARAMETERS"] = json.dumps(job["parameters"])
+        env["ENV_REQUEST_ID"] = job["request_id"]
+        return env
+
+    def _container_name(self, job: dict) -> str:
+        return f"training-job-{job['job_id']}"
+
+    def _run_args(self, job: dict) -> List[str]:
+        args = [
+            "run", "--rm", "--name", self._container_name(job),
+            "--cpuset-cpus", ",".join(str(core) for core in job["cores"]),
+            "--cpus", str(job["nthread"]),
+            "--network", self.settings.training_network,
+            "-v", f"{self.workspace}:{CONTAINER_WORKSPACE}",
+            "-v", f"{Path(job['output_dir']).parent}:{CONTAINER_JOB_DIR}",
+            "-w", os.path.dirname(self._in_container(job["script"])),
+        ]
+        for name, value in self._environment(job).items():
+            args += ["-e", f"{name}={value}"]
+        for name in self.settings.training_env_passthrough.split(","):
+            if name.strip():
+                # Without a value podman copies the variable from its own environment
+                args += ["-e", name.strip()]
+        return args + [job["image"]] + self._command(job)
+
+    def image_for(self, framework_option: Optional[str]) -> str:
+        """Container image of the request's first framework that has one, else TRAINING_IMAGE"""
+        images = get_catalog().data.get("images", {})
+        for key in split_frameworks(framework_option):
+            image = images.get(key, {}).get("image")
+            if image:
+                return image
+        return self.settings.training_image
+
+    def submit(self, request_id: str, data: TrainingJobCreate, framework_option: Optional[str] = None) -> dict:
+        """Validate a job, create its directory and queue it for the pool"""
+        script = resolve_inside(self.workspace, data.script_path)
+        if script.suffix not in (".py", ".ipynb"):
+            raise HTTPException(status_code=400, detail="script_path must be a .py script or .ipynb notebook")
+        if not script.is_file():
+            raise HTTPException(status_code=404, detail=f"Script not found in workspace: {data.script_path}")
+
+        nthread = data.nthread or self.settings.training_default_nthread
+        if nthread > len(self.cores):
+            raise HTTPException(
+                status_code=400,
+                detail=f"nthread {nthread} exceeds the training CPU budget of {len(self.cores)} cores"
+            )
+
+        job_id = str(uuid.uuid4())
+        job_dir = self.jobs_dir / job_id
+        (job_dir / "output").mkdir(parents=True)
+        job = {
+            "job_id": job_id,
+            "request_id": request_id,
+            "script_path": data.script_path,
+            "script": str(script),
+            "image": self.image_for(framework_option),
+            "parameters": data.parameters,
+            "nthread": nthread,
+            "timeout_minutes": data.timeout_minutes or self.settings.training_job_timeout_minutes,
+            "state": "queued",
+            "cores": [],
+            "returncode": None,
+            "submitted_at": datetime.utcnow().isoformat(),
+            "started_at": None,
+            "finished_at": None,
+            "log_path": str(job_dir / "job.log"),
+            "output_dir": str(job_dir / "output"),
+        }
+        self.jobs[job_id] = job
+        self._prune_finished()
+        self._waiting.append(job_id)
+        self._tasks[job_id] = asyncio.create_task(self._run(job))
+        logger.info(f"TRAINING: Queued job {job_id} for {request_id}: {data.script_path} (nthread={nthread})")
+        return self.describe(job)
+
+    def _prune_finished(self) -> None:
+        finished = [job_id for job_id, job in self.jobs.items() if job["state"] in FINISHED_STATES]
+        for job_id in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            del self.jobs[job_id]
+
+    def _get_condition(self) -> asyncio.Condition:
+        if self._condition is None:
+            self._condition = asyncio.Condition()
+        return self._condition
+
+    async def _acquire(self, job: dict) -> bool:
+        """Wait for the job's turn, a free pool slot and enough free cores; False if cancelled meanwhile"""
+        condition = self._get_condition()
+        async with condition:
+            await condition.wait_for(lambda: job["state"] != "queued" or (
+                self._waiting[0] == job["job_id"]
+                and self._running < self.settings.training_max_jobs
+                and len(self._free_cores) >= job["nthread"]
+            ))
+            self._waiting.remove(job["job_id"])
+            if job["state"] != "queued":
+                condition.notify_all()
+                return False
+            job["cores"] = sorted(self._free_cores)[:job["nthread"]]
+            self._free_cores.difference_update(job["cores"])
+            self._running += 1
+            # The next job in line may fit in the remaining cores
+            condition.notify_all()
+            return True
+
+    async def _release(self, job: dict) -> None:
+        condition = self._get_condition()
+        async with condition:
+            self._free_cores.update(job["cores"])
+            self._running -= 1
+            condition.notify_all()
+
+    async def _run(self, job: dict) -> None:
+        if not await self._acquire(job):
+            self._tasks.pop(job["job_id"], None)
+            return
+
+        job["state"] = "running"
+        job["started_at"] = datetime.utcnow().isoformat()
+        stop_requested = self._stop_requested[job["job_id"]] = asyncio.Event()
+        try:
+            with open(job["log_path"], "ab") as log:
+                run_task = asyncio.create_task(self.runner.run(self._run_args(job), timeout=None, log=log))
+                logger.info(f"TRAINING: Started job {job['job_id']} in {job['image']} on cores {job['cores']}")
+                stop_wait = asyncio.create_task(stop_requested.wait())
+                done, _ = await asyncio.wait(
+                    {run_task, stop_wait}, timeout=job["timeout_minutes"] * 60, return_when=asyncio.FIRST_COMPLETED
+                )
+                stop_wait.cancel()
+                if run_task not in done:
+                    if job["state"] == "running":
+                        job["state"] = "timed_out"
+                    await self._stop_container(job, run_task)
+                result = await run_task
+            job["returncode"] = result.returncode
+            if job["state"] == "running":
+                job["state"] = "succeeded" if result.ok else "failed"
+        except Exception as e:
+            logger.exception(f"TRAINING: Job {job['job_id']} could not run: {e}")
+            job["state"] = "failed"
+        finally:
+            job["finished_at"] = datetime.utcnow().isoformat()
+            self._stop_requested.pop(job["job_id"], None)
+            self._tasks.pop(job["job_id"], None)
+            await self._release(job)
+            logger.info(f"TRAINING: Job {job['job_id']} {job['state']} (exit code {job['returncode']})")
+
+    async def _stop_container(self, job: dict, run_task: asyncio.Task) -> None:
+        """podman stop (SIGTERM, then SIGKILL after the grace period) until the job's run returns.
+
+        Retried because a container that is still being created cannot be stopped yet.
+        """
+        grace = self.settings.training_kill_grace_seconds
+        name = self._container_name(job)
+        for _ in range(STOP_ATTEMPTS):
+            await self.runner.run(["stop", "-t", str(grace), name], timeout=grace + 30)
+            await asyncio.wait({run_task}, timeout=grace + 5)
+            if run_task.done():
+                return
+        logger.error(f"TRAINING: Job {job['job_id']} did not stop, removing its container")
+        run_task.cancel()
+        await self.runner.run(["rm", "-f", name], timeout=grace + 30)
+
+    async def cancel(self, job_id: str) -> dict:
+        job = self.get(job_id)
+        if job["state"] in FINISHED_STATES:
+            return self.describe(job)
+        previous = job["state"]
+        job["state"] = "cancelled"
+        if previous == "queued":
+            job["finished_at"] = datetime.utcnow().isoformat()
+            condition = self._get_condition()
+            async with condition:
+                condition.notify_all()
+        elif job_id in self._stop_requested:
+            self._stop_requested[job_id].set()
+        logger.info(f"TRAINING: Cancelled job {job_id} ({previous})")
+        return self.describe(job)
+
+    def get(self, job_id: str, request_id: Optional[str] = None) -> dict:
+        job = self.jobs.get(job_id)
+        if job is None or (request_id is not None and job["request_id"] != request_id):
+            raise HTTPException(status_code=404, detail=f"Training job not found: {job_id}")
+        return job
+
+    def describe(self, job: dict) -> dict:
+        result = {key: value for key, value in job.items() if key not in ("script", "log_path", "output_dir")}
+        if job["state"] == "queued":
+            result["queue_position"] = list(self._waiting).index(job["job_id"]) + 1
+        return result
+
+    def list_jobs(self, request_id: str) -> List[dict]:
+        return [self.describe(job) for job in self.jobs.values() if job["request_id"] == request_id]
+
+    def read_log(self, job: dict, offset: int = 0, limit: int = 65536) -> dict:
+        """Log output from a byte offset, for polling clients"""
+        data = b""
+        if os.path.exists(job["log_path"]):
+            with open(job["log_path"], "rb") as log:
+                log.seek(offset)
+                data = log.read(limit)
+        return {
+            "offset": offset + len(data),
+            "data": data.decode(errors="replace"),
+            "finished": job["state"] in FINISHED_STATES
+        }
+
+    async def follow_log(self, job: dict, offset: int = 0):
+        """Yield log output as it is written, until the job finishes"""
+        while True:
+            finished = job["state"] in FINISHED_STATES
+            chunk = self.read_log(job, offset)
+            offset = chunk["offset"]
+            if chunk["data"]:
+                yield chunk["data"]
+            elif finished:
+                return
+            else:
+                await asyncio.sleep(1)
+
+    def list_artifacts(self, job: dict) -> List[dict]:
+        root = Path(job["output_dir"])
+        return [
+            {"name": str(path.relative_to(root)), "size": path.stat().st_size}
+            for path in sorted(root.rglob("*")) if path.is_file()
+        ]
+
+    def artifact_path(self, job: dict, name: str) -> Path:
+        path = resolve_inside(Path(job["output_dir"]), name)
+        if not path.is_file():
+            raise HTTPException(status_code=404, detail=f"Artifact not found: {name}")
+        return path
+
+    def get_status(self) -> dict:
+        states: Dict[str, int] = {}
+        for job in self.jobs.values():
+            states[job["state"]] = states.get(job["state"], 0) + 1
+        return {
+            "max_jobs": self.settings.training_max_jobs,
+            "running": self._running,
+            "queued": len(self._waiting),
+            "cores": self.cores,
+            "free_cores": sorted(self._free_cores),
+            "jobs_by_state": states
+        }
+
+    async def stop(self) -> None:
+        """Cancel queued and running jobs on shutdown"""
+        for job_id in list(self._tasks):
+            await self.cancel(job_id)
+        if self._tasks:
+            await asyncio.gather(*list(self._tasks.values()), return_exceptions=True)